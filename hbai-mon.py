@@ -9,20 +9,39 @@ Author: Harald Boehmecke
 
 import sys
 import os
+import io
 import json
+import shlex
+import select
 import configparser
 import logging
+import logging.handlers
+import queue
+import atexit
 import syslog
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import List, Dict, Optional
-import mysql.connector
-from mysql.connector import Error
+from typing import List, Dict, Optional, Iterator, Tuple, TYPE_CHECKING
 import time
 
+# mysql.connector and the AI client are imported where first used, so the
+# error paths in main() exit without paying for them
+if TYPE_CHECKING:
+    import mysql.connector
+    from mysql.connector import pooling
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add module path
 sys.path.insert(0, '/etc/hbai-mon')
 from hbai_executor import CommandExecutor
-from hbai_ollama import InteractiveAIAnalyzer
+from hbai_colors import Colors, SEP
 
 # Configuration paths
 CONFIG_DIR = "/etc/hbai-mon"
@@ -31,62 +50,179 @@ AI_CONFIG_FILE = f"{CONFIG_DIR}/ai.conf"
 AUDIT_LOG_FILE = f"{CONFIG_DIR}/audit.log"
 INFRASTRUCTURE_FILE = f"{CONFIG_DIR}/infrastructure.txt"
 
+# Audit records never use thread/process fields - skip collecting them
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+# Connections kept open per MySQL connection pool
+DB_POOL_SIZE = 2
+
+# Seconds to wait for a MySQL connect before giving up
+DB_CONNECT_TIMEOUT = 3
+
+# Parallel SSH sessions used for the initial per-alert probes - they share one
+# multiplexed jumpserver connection, so stay below sshd's MaxSessions (10)
+PROBE_WORKERS = 8
+
+# Seconds to wait for an operator answer before auto-skipping
+PROMPT_TIMEOUT = 300
+
+# Output chars kept per command in the diagnosis history - prompts use at most
+# 3000, so the rest of a `find /` or `du -ax /` dump is dead weight
+HISTORY_OUTPUT_MAX = 10_000
+
+
+# Pre-rendered colored constants for the display path
+HR_HEADER = f"{Colors.HEADER}{SEP}{Colors.ENDC}"
+HR_OKGREEN = f"{Colors.OKGREEN}{SEP}{Colors.ENDC}"
+BANNER = f"""
+{Colors.HEADER}╔══════════════════════════════════════════════════════════════╗
+║                                                              ║
+║   {Colors.BOLD}HBAI-MON{Colors.ENDC}{Colors.HEADER} - Automated Disk Space Monitoring            ║
+║   Version 3.1.0 - Multi-host AI Diagnosis                    ║
+║                                                              ║
+╚══════════════════════════════════════════════════════════════╝{Colors.ENDC}
+        """
+
+
+class Screen:
+    """Collects terminal output and writes each logical block in one call"""
+
+    def __init__(self):
+        self._lines = []
+
+    def line(self, text: str = ''):
+        self._lines.append(text)
 
-class Colors:
-    """ANSI color codes for terminal output"""
-    HEADER = '\033[95m'
-    OKBLUE = '\033[94m'
-    OKCYAN = '\033[96m'
-    OKGREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+    def flush(self, end: str = '\n'):
+        if self._lines:
+            sys.stdout.write('\n'.join(self._lines) + end)
+            sys.stdout.flush()
+            self._lines.clear()
+
+
+class SyslogHandler(logging.Handler):
+    """Forwards audit records to the local syslog daemon"""
+
+    PRIORITIES = {
+        logging.ERROR: syslog.LOG_ERR,
+        logging.WARNING: syslog.LOG_WARNING,
+    }
+
+    def emit(self, record: logging.LogRecord):
+        priority = self.PRIORITIES.get(record.levelno, syslog.LOG_INFO)
+        syslog.syslog(priority, f"HBAI-MON: {record.audit_message}")
+
+
+class AuditFileHandler(logging.Handler):
+    """Appends pre-serialized audit lines to the log file, bypassing Formatter"""
+
+    def __init__(self, log_file: str):
+        super().__init__()
+        self.fd = os.open(log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def emit(self, record: logging.LogRecord):
+        os.write(self.fd, record.audit_line)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        super().close()
+
+
+# Shared details of entries logged without any - never mutated
+_NO_DETAILS: Dict = {}
 
 
 class AuditLogger:
     """Handles audit logging for AI interactions"""
 
+    LEVELS = {
+        'ERROR': logging.ERROR,
+        'WARNING': logging.WARNING,
+    }
+
     def __init__(self, log_file: str):
+        self.user = os.getenv('USER', 'unknown')
+
+        # Entries waiting for the optional DB sink (see enable_db_buffer)
+        self.pending = None
+
+        # DEBUG entries are dropped unless HBAI_DEBUG is set (e.g. HBAI_DEBUG=1)
+        self.debug_enabled = os.getenv('HBAI_DEBUG', '') not in ('', '0')
+
         # Ensure log directory exists
         log_dir = os.path.dirname(log_file)
-        if log_dir and not os.path.exists(log_dir):
+        if log_dir:
             os.makedirs(log_dir, exist_ok=True)
 
         # Configure file logger
         self.file_logger = logging.getLogger('hbai_audit')
         self.file_logger.setLevel(logging.INFO)
+        self.file_logger.propagate = False
 
-        # Create file handler
-        file_handler = logging.FileHandler(log_file)
-        file_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(file_format)
-        self.file_logger.addHandler(file_handler)
+        # Create file handler - the JSON entry already carries timestamp and level
+        file_handler = AuditFileHandler(log_file)
 
         # Also log to syslog
         syslog.openlog("hbai-mon", syslog.LOG_PID, syslog.LOG_LOCAL0)
+        syslog_handler = SyslogHandler()
+
+        # log() only enqueues; a background thread writes to file and syslog
+        log_queue = queue.SimpleQueue()
+        self.file_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        self.listener = logging.handlers.QueueListener(log_queue, file_handler, syslog_handler)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def is_enabled(self, level: str) -> bool:
+        """Whether entries of this level are recorded - lets callers skip building them"""
+        return level != 'DEBUG' or self.debug_enabled
 
     def log(self, level: str, message: str, details: dict = None):
         """Log an audit event"""
+        if level == 'DEBUG' and not self.debug_enabled:
+            return
+
+        # Bare log(level, message) calls - the common success path - share one
+        # read-only empty details dict instead of allocating and serializing a new one
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.now(),
             'level': level,
             'message': message,
-            'details': details or {}
+            'details': details or _NO_DETAILS
         }
 
-        # Log to file
-        log_str = json.dumps(log_entry)
-        if level == 'ERROR':
-            self.file_logger.error(log_str)
-            syslog.syslog(syslog.LOG_ERR, f"HBAI-MON: {message}")
-        elif level == 'WARNING':
-            self.file_logger.warning(log_str)
-            syslog.syslog(syslog.LOG_WARNING, f"HBAI-MON: {message}")
+        # orjson serializes the datetime natively (same ISO format as isoformat())
+        if orjson:
+            log_line = orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE)
         else:
-            self.file_logger.info(log_str)
-            syslog.syslog(syslog.LOG_INFO, f"HBAI-MON: {message}")
+            log_line = (json.dumps(log_entry, default=datetime.isoformat) + '\n').encode()
+        self.file_logger.log(self.LEVELS.get(level, logging.INFO), message,
+                             extra={'audit_message': message, 'audit_line': log_line})
+
+        if self.pending is not None:
+            if not details:
+                details_json = '{}'
+            elif orjson:
+                details_json = orjson.dumps(details).decode()
+            else:
+                details_json = json.dumps(details, default=str)
+            self.pending.append((log_entry['timestamp'], level, message, details_json))
+
+    def enable_db_buffer(self, maxlen: int = 1000):
+        """Start buffering entries for a batched write with flush_to_db()"""
+        self.pending = deque(maxlen=maxlen)
+
+    def flush_to_db(self, db_manager: 'DatabaseManager'):
+        """Write all buffered entries to the HBAI DB in one round trip"""
+        if not self.pending:
+            return
+        batch = list(self.pending)
+        self.pending.clear()
+        db_manager.write_audit_batch(batch)
 
     def log_ai_interaction(self, action: str, hostname: str, command: str = None,
                            response: str = None, approved: bool = None):
@@ -97,65 +233,167 @@ class AuditLogger:
             'command': command,
             'response_length': len(response) if response else 0,
             'approved': approved,
-            'user': os.getenv('USER', 'unknown')
+            'user': self.user
         }
         self.log('INFO', f"AI_{action}: {hostname}", details)
 
 
+# Parsed INI files keyed by path, with the mtime they were parsed at
+_CONFIG_CACHE: Dict[str, tuple] = {}
+
+
+def _load_ini(path: str) -> configparser.ConfigParser:
+    """Parse an INI file once and reuse it until its mtime changes"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _CONFIG_CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    config = configparser.ConfigParser()
+    config.read(path)
+    _CONFIG_CACHE[path] = (mtime, config)
+    return config
+
+
+@dataclass(frozen=True, slots=True)
+class MySQLCreds:
+    """Connection parameters from one [mysql_*] credentials section"""
+    host: str
+    port: int
+    user: str
+    password: str
+    database: str
+
+    @classmethod
+    def from_section(cls, section: configparser.SectionProxy) -> 'MySQLCreds':
+        return cls(
+            host=section['host'],
+            port=section.getint('port'),
+            user=section['user'],
+            password=section['password'],
+            database=section['database']
+        )
+
+
 class DatabaseManager:
     """Handles all database connections and queries"""
 
+    MYSQL_SECTIONS = ('mysql_observium', 'mysql_hbai')
+
+    # Sent as a server-side prepared statement (binary protocol), so the
+    # LIKE wildcard is a literal '%' rather than '%%'
+    DISK_ALERT_QUERY = """
+        SELECT
+            s.storage_id,
+            s.device_id,
+            d.hostname,
+            d.status as device_status,
+            s.storage_descr,
+            s.storage_perc,
+            ROUND(COALESCE(s.storage_used, 0) / 1073741824, 2) AS used_gb,
+            ROUND(COALESCE(s.storage_size, 0) / 1073741824, 2) AS total_gb,
+            ROUND((COALESCE(s.storage_size, 0) - COALESCE(s.storage_used, 0)) / 1073741824, 2) AS free_gb
+        FROM storage s
+        JOIN devices d ON s.device_id = d.device_id
+        WHERE s.storage_type = 'hrStorageFixedDisk'
+            AND s.storage_ignore = 0
+            AND s.storage_deleted = 0
+            AND s.storage_perc >= %s
+            AND d.status = 1
+            AND d.ignore = 0
+            AND d.disabled = 0
+            AND d.hostname LIKE 'hb%'
+            AND s.storage_descr NOT REGEXP '^/(proc|sys|dev|run)'
+        ORDER BY s.storage_perc DESC
+        """
+
     def __init__(self, credentials_file: str, audit_logger: AuditLogger):
         self.credentials = self._load_credentials(credentials_file)
-        self.conn_observium = None
-        self.conn_hbai = None
+        self.mysql_creds = {
+            name: MySQLCreds.from_section(self.credentials[name])
+            for name in self.MYSQL_SECTIONS if self.credentials.has_section(name)
+        }
+        self.pools = {}
+        self.connections = {}
+        # Optional [mysql_hbai] audit_table to mirror the audit log into
+        self.audit_table = self.credentials.get('mysql_hbai', 'audit_table', fallback=None)
+        self._alert_cursor = None
+        self._alert_cursor_conn = None
         self.audit = audit_logger
 
+        # Row decoding runs in C only when the connector's C extension is available
+        from mysql.connector import HAVE_CEXT
+        if not HAVE_CEXT:
+            self.audit.log('WARNING', 'mysql-connector C extension not available, '
+                                      'falling back to the pure Python protocol')
+
     def _load_credentials(self, filepath: str) -> configparser.ConfigParser:
         """Load credentials from INI file"""
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"Credentials file not found: {filepath}")
-
-        config = configparser.ConfigParser()
-        config.read(filepath)
-        return config
-
-    def connect_observium(self) -> mysql.connector.MySQLConnection:
-        """Connect to Observium database"""
         try:
-            creds = self.credentials['mysql_observium']
-            self.conn_observium = mysql.connector.connect(
-                host=creds['host'],
-                port=int(creds['port']),
-                user=creds['user'],
-                password=creds['password'],
-                database=creds['database']
+            return _load_ini(filepath)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Credentials file not found: {filepath}") from None
+
+    def _get_pool(self, section: str) -> 'pooling.MySQLConnectionPool':
+        """Get (or lazily create) the connection pool for a credentials section"""
+        from mysql.connector import pooling
+        if section not in self.pools:
+            self.pools[section] = pooling.MySQLConnectionPool(
+                pool_name=f"hbai_{section}",
+                pool_size=DB_POOL_SIZE,
+                pool_reset_session=False,
+                **asdict(self.mysql_creds[section]),
+                use_pure=False,
+                consume_results=True,
+                connection_timeout=DB_CONNECT_TIMEOUT
             )
-            return self.conn_observium
-        except Error as e:
-            self.audit.log('ERROR', 'Failed to connect to Observium DB', {'error': str(e)})
-            raise Exception(f"Failed to connect to Observium DB: {e}")
+        return self.pools[section]
+
+    def _get_conn(self, section: str, label: str) -> 'mysql.connector.MySQLConnection':
+        """Return the cached connection for a section, reconnecting only if it dropped"""
+        from mysql.connector import Error
+        conn = self.connections.get(section)
+        if conn is not None:
+            try:
+                session = conn.connection_id
+                conn.ping(reconnect=True, attempts=2, delay=1)
+                if conn.connection_id != session:
+                    # Prepared statements died with the old server session
+                    self._alert_cursor = None
+                return conn
+            except Error:
+                # Hand the dead connection back so the pool slot is not leaked
+                conn.close()
 
-    def connect_hbai(self) -> mysql.connector.MySQLConnection:
-        """Connect to HBAI database"""
         try:
-            creds = self.credentials['mysql_hbai']
-            self.conn_hbai = mysql.connector.connect(
-                host=creds['host'],
-                port=int(creds['port']),
-                user=creds['user'],
-                password=creds['password'],
-                database=creds['database']
-            )
-            return self.conn_hbai
+            conn = self._get_pool(section).get_connection()
+            self.connections[section] = conn
+            return conn
         except Error as e:
-            self.audit.log('ERROR', 'Failed to connect to HBAI DB', {'error': str(e)})
-            raise Exception(f"Failed to connect to HBAI DB: {e}")
+            self.audit.log('ERROR', f'Failed to connect to {label} DB', {'error': str(e)})
+            raise Exception(f"Failed to connect to {label} DB: {e}")
+
+    def connect_observium(self) -> 'mysql.connector.MySQLConnection':
+        """Get a connection to the Observium database"""
+        return self._get_conn('mysql_observium', 'Observium')
 
-    def execute_query(self, connection: mysql.connector.MySQLConnection,
+    def connect_hbai(self) -> 'mysql.connector.MySQLConnection':
+        """Get a connection to the HBAI database"""
+        return self._get_conn('mysql_hbai', 'HBAI')
+
+    def execute_query(self, connection: 'mysql.connector.MySQLConnection',
                      query: str, params: tuple = None,
-                     fetch: bool = True) -> Optional[List]:
-        """Execute a SQL query"""
+                     fetch: bool = True, stream: bool = False) -> Optional[List]:
+        """Execute a SQL query
+
+        With stream=True, returns an iterator over rows read from an
+        unbuffered cursor instead of a fully materialized list.
+        """
+        if stream:
+            return self._stream_query(connection, query, params)
+
+        from mysql.connector import Error
+
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(query, params or ())
@@ -170,51 +408,90 @@ class DatabaseManager:
         finally:
             cursor.close()
 
-    def get_disk_alerts(self, threshold: int = 80) -> List[Dict]:
-        """Fetch disk alerts from Observium - EXCLUDE DOWN HOSTS"""
-        conn = self.connect_observium()
+    def _stream_query(self, connection: 'mysql.connector.MySQLConnection',
+                      query: str, params: tuple = None, cursor=None) -> Iterator[Dict]:
+        """Yield rows from an unbuffered cursor as the server sends them
 
-        query = """
-        SELECT
-            s.storage_id,
-            s.device_id,
-            d.hostname,
-            d.status as device_status,
-            s.storage_descr,
-            s.storage_perc,
-            s.storage_size,
-            s.storage_used,
-            s.storage_free
-        FROM storage s
-        JOIN devices d ON s.device_id = d.device_id
-        WHERE s.storage_perc >= %s
-            AND d.hostname LIKE 'hb%%'
-            AND d.status = 1
-            AND d.ignore = 0
-            AND d.disabled = 0
-            AND s.storage_ignore = 0
-            AND s.storage_deleted = 0
-            AND s.storage_type = 'hrStorageFixedDisk'
-            AND s.storage_descr NOT LIKE '/proc%%'
-            AND s.storage_descr NOT LIKE '/sys%%'
-            AND s.storage_descr NOT LIKE '/dev%%'
-            AND s.storage_descr NOT LIKE '/run%%'
-        ORDER BY s.storage_perc DESC
+        Rows come off a plain tuple cursor and are mapped to dicts with the
+        column names read once per query. A caller-supplied cursor (e.g. a
+        cached prepared one) is left open.
         """
+        from mysql.connector import Error
+        own_cursor = cursor is None
+        if own_cursor:
+            cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            columns = cursor.column_names
+            for row in cursor:
+                yield dict(zip(columns, row))
+        except Error as e:
+            self.audit.log('ERROR', 'Database query failed', {'error': str(e)})
+        finally:
+            if own_cursor:
+                cursor.close()
+
+    def _get_alert_cursor(self, connection: 'mysql.connector.MySQLConnection'):
+        """Return the cached prepared cursor for the alert query
 
-        results = self.execute_query(conn, query, (threshold,))
+        The statement is prepared once per connection; if the pool handed out
+        a different connection the cursor is recreated on it.
+        """
+        if self._alert_cursor is None or self._alert_cursor_conn is not connection:
+            self._alert_cursor = connection.cursor(prepared=True)
+            self._alert_cursor_conn = connection
+        return self._alert_cursor
+
+    def get_disk_alerts(self, threshold: int = 80) -> Iterator[Dict]:
+        """Stream disk alerts from Observium - EXCLUDE DOWN HOSTS
+
+        The equality filters come first so the optional composite index in
+        observium-indexes.sql can serve both the storage_perc range and the
+        ORDER BY without a filesort.
+        """
+        conn = self.connect_observium()
+        cursor = self._get_alert_cursor(conn)
 
-        if results:
-            self.audit.log('INFO', f'Found {len(results)} disk alerts above {threshold}%')
+        count = 0
+        for row in self._stream_query(conn, self.DISK_ALERT_QUERY, (threshold,), cursor=cursor):
+            count += 1
+            yield row
 
-        return results or []
+        if count:
+            self.audit.log('INFO', f'Found {count} disk alerts above {threshold}%')
+
+    def write_audit_batch(self, rows: List[tuple]):
+        """Insert (ts, level, message, details) audit rows with a single executemany"""
+        from mysql.connector import Error
+        conn = self.connect_hbai()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                f"INSERT INTO `{self.audit_table}` (ts, level, message, details) "
+                "VALUES (%s, %s, %s, %s)", rows)
+            conn.commit()
+        except Error as e:
+            self.audit.log('ERROR', 'Audit DB flush failed', {'error': str(e), 'rows': len(rows)})
+        finally:
+            cursor.close()
 
     def close_all(self):
-        """Close all database connections"""
-        if self.conn_observium and self.conn_observium.is_connected():
-            self.conn_observium.close()
-        if self.conn_hbai and self.conn_hbai.is_connected():
-            self.conn_hbai.close()
+        """Return all pooled connections to their pools"""
+        from mysql.connector import Error
+        if self._alert_cursor is not None:
+            try:
+                self._alert_cursor.close()
+            except Error:
+                pass  # Statement dies with the connection anyway
+            self._alert_cursor = None
+            self._alert_cursor_conn = None
+        # No is_connected() ping here - it can block on an unreachable server
+        for conn in self.connections.values():
+            try:
+                conn.close()
+            except Error:
+                pass
+        self.connections.clear()
 
 
 class InfrastructureInfo:
@@ -223,25 +500,33 @@ class InfrastructureInfo:
     def __init__(self, infrastructure_file: str):
         self.hosts = {}
         self.jumpserver = None
+        self._short_index = {}
+        self.available = False
         self._load(infrastructure_file)
 
     def _load(self, filepath: str):
         """Load and parse infrastructure file"""
-        if not os.path.exists(filepath):
+        try:
+            f = open(filepath, 'r')
+        except FileNotFoundError:
             return
 
-        with open(filepath, 'r') as f:
+        self.available = True
+        with f:
             for line in f:
                 line = line.strip()
                 if not line or line.startswith('#'):
                     continue
 
-                parts = [p.strip() for p in line.split('|')]
-                if len(parts) >= 3:
-                    hostname = parts[0]
-                    host_type = parts[1]
-                    role = parts[2]
-                    notes = parts[3] if len(parts) > 3 else ''
+                # hostname | type | role [| notes] - extra fields are ignored
+                hostname, _, rest = line.partition('|')
+                host_type, sep, rest = rest.partition('|')
+                if sep:
+                    hostname = hostname.strip()
+                    host_type = host_type.strip()
+                    role, _, rest = rest.partition('|')
+                    role = role.strip()
+                    notes = rest.partition('|')[0].strip()
 
                     self.hosts[hostname] = {
                         'type': host_type,
@@ -249,6 +534,12 @@ class InfrastructureInfo:
                         'notes': notes
                     }
 
+                    # Index every leading label prefix ("hbcsrv12", "hbcsrv12.internal", ...)
+                    # - first host listed wins, as the old linear scan did
+                    labels = hostname.split('.')
+                    for i in range(1, len(labels)):
+                        self._short_index.setdefault('.'.join(labels[:i]), hostname)
+
                     if role == 'jumpserver':
                         self.jumpserver = hostname
 
@@ -275,34 +566,41 @@ class InfrastructureInfo:
         if fqdn in self.hosts:
             return fqdn
 
-        # Search for partial match
-        for hostname in self.hosts:
-            if hostname.startswith(short_name + '.'):
-                return hostname
+        # Partial match on leading labels
+        return self._short_index.get(short_name)
 
-        return None
+
+# Numeric [ollama] options and the type load_ai_config() converts them to
+AI_CONFIG_TYPES = {
+    'timeout': int,
+    'min_commands_required': int,
+    'temperature': float,
+    'num_ctx': int,
+    'num_predict': int,
+    'top_p': float,
+    'top_k': int,
+    'repeat_penalty': float,
+}
 
 
 def load_ai_config(config_file: str, credentials_file: str) -> Dict[str, str]:
     """Load AI configuration from ai.conf and merge with API key from credentials"""
-    if not os.path.exists(config_file):
-        raise FileNotFoundError(f"AI configuration file not found: {config_file}")
-    
-    if not os.path.exists(credentials_file):
-        raise FileNotFoundError(f"Credentials file not found: {credentials_file}")
-    
-    # Load ai.conf
-    config = configparser.ConfigParser()
-    config.read(config_file)
+    # Load ai.conf - _load_ini's stat doubles as the existence check
+    try:
+        config = _load_ini(config_file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"AI configuration file not found: {config_file}") from None
     
     if 'ollama' not in config:
         raise ValueError(f"[ollama] section missing in {config_file}")
     
     ai_config = dict(config['ollama'])
     
-    # Load API key from credentials
-    creds = configparser.ConfigParser()
-    creds.read(credentials_file)
+    # Load API key from credentials (shared with DatabaseManager)
+    try:
+        creds = _load_ini(credentials_file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Credentials file not found: {credentials_file}") from None
     
     if 'ollama_api' not in creds:
         raise ValueError(f"[ollama_api] section missing in {credentials_file}")
@@ -314,25 +612,20 @@ def load_ai_config(config_file: str, credentials_file: str) -> Dict[str, str]:
     ai_config['key'] = creds['ollama_api']['key']
     
     # Convert numeric strings to proper types for convenience
-    if 'timeout' in ai_config:
-        ai_config['timeout'] = int(ai_config['timeout'])
-    if 'min_commands_required' in ai_config:
-        ai_config['min_commands_required'] = int(ai_config['min_commands_required'])
-    if 'temperature' in ai_config:
-        ai_config['temperature'] = float(ai_config['temperature'])
-    if 'num_ctx' in ai_config:
-        ai_config['num_ctx'] = int(ai_config['num_ctx'])
-    if 'num_predict' in ai_config:
-        ai_config['num_predict'] = int(ai_config['num_predict'])
-    if 'top_p' in ai_config:
-        ai_config['top_p'] = float(ai_config['top_p'])
-    if 'top_k' in ai_config:
-        ai_config['top_k'] = int(ai_config['top_k'])
-    if 'repeat_penalty' in ai_config:
-        ai_config['repeat_penalty'] = float(ai_config['repeat_penalty'])
+    for key, convert in AI_CONFIG_TYPES.items():
+        if key in ai_config:
+            ai_config[key] = convert(ai_config[key])
     
     return ai_config
 
+
+def _history_output(stdout: str) -> str:
+    """Cap command output before it is kept in the diagnosis history"""
+    if not stdout or len(stdout) <= HISTORY_OUTPUT_MAX:
+        return stdout
+    return f"{stdout[:HISTORY_OUTPUT_MAX]}\n... (truncated, {len(stdout)} chars total)"
+
+
 class InteractiveDiagnostic:
     """Handles interactive diagnostic flow with AI"""
 
@@ -341,28 +634,94 @@ class InteractiveDiagnostic:
         self.audit = audit_logger
 
         # Initialize AI analyzer with merged config
+        from hbai_ollama import InteractiveAIAnalyzer
         self.ai = InteractiveAIAnalyzer(ai_config, audit_logger)
+        self.ai.prewarm()
 
         # Initialize command executor
         ssh_creds = dict(self.db.credentials['ssh_default'])
-        self.executor = CommandExecutor(ssh_creds, audit_logger, CREDENTIALS_FILE)
+        self.executor = CommandExecutor.instance(ssh_creds, audit_logger, CREDENTIALS_FILE)
 
         # Load infrastructure info
         self.infra = InfrastructureInfo(INFRASTRUCTURE_FILE)
 
+        # Initial probe (batch future, index) per (hostname, mount point), started up front
+        self.initial_probes = {}
+        self._probe_pool = None
+
+        # Raw stdin bytes not yet consumed by _prompt - answers are read with
+        # os.read, so lines already received never hide in a TextIOWrapper
+        # buffer that select() cannot see
+        self._stdin_buf = b''
+
+    def _prompt(self, timeout: int = PROMPT_TIMEOUT) -> Optional[str]:
+        """Read one answer from stdin, or None if nothing arrives within timeout seconds"""
+        sys.stdout.flush()
+        fd = sys.stdin.fileno()
+        deadline = time.monotonic() + timeout
+
+        while b'\n' not in self._stdin_buf:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                # EOF - a last answer without newline still counts
+                if not self._stdin_buf:
+                    raise EOFError("stdin closed")
+                self._stdin_buf += b'\n'
+                break
+            self._stdin_buf += chunk
+
+        line, _, self._stdin_buf = self._stdin_buf.partition(b'\n')
+        return line.decode(errors='replace').strip().lower()
+
+    def precollect(self, alerts: List[Dict]) -> Dict[tuple, Tuple[Future, int]]:
+        """Start the initial read-only disk probe for all alerts in parallel
+
+        Probes for the same host run as one batch (one cn session). Returns
+        immediately with (future, index) per (hostname, mount point); each
+        alert waits only for its own host's batch.
+        """
+        mounts_by_host: Dict[str, List[str]] = {}
+        for alert in alerts:
+            mounts_by_host.setdefault(alert['hostname'], []).append(alert['storage_descr'])
+
+        def probe(hostname: str, mounts: List[str]) -> List[Dict]:
+            commands = [f"df -h {shlex.quote(mount)}" for mount in mounts]
+            results = self.executor.execute_batch(hostname, commands)
+            for result in results:
+                self.audit.log_ai_interaction('PROBE_EXECUTED', hostname,
+                                              command=result['command'],
+                                              response=f"success={result['success']}")
+            return results
+
+        self._probe_pool = ThreadPoolExecutor(max_workers=min(len(mounts_by_host), PROBE_WORKERS))
+        probes = {}
+        for hostname, mounts in mounts_by_host.items():
+            future = self._probe_pool.submit(probe, hostname, mounts)
+            for index, mount in enumerate(mounts):
+                probes[(hostname, mount)] = (future, index)
+        return probes
+
     def process_alert(self, alert: Dict) -> bool:
         """Process a single disk alert interactively with AI"""
         hostname = alert['hostname']
         mount_point = alert['storage_descr']
         usage_perc = alert['storage_perc']
-        used_gb = alert['storage_used'] / (1024**3) if alert['storage_used'] else 0
-        total_gb = alert['storage_size'] / (1024**3) if alert['storage_size'] else 0
-        free_gb = total_gb - used_gb
+        used_gb = alert['used_gb']
+        total_gb = alert['total_gb']
+        free_gb = alert['free_gb']
 
-        print(f"\n{Colors.HEADER}{'='*80}{Colors.ENDC}")
-        print(f"{Colors.BOLD}Processing Alert: {hostname}:{mount_point}{Colors.ENDC}")
-        print(f"  Usage: {Colors.WARNING}{usage_perc}%{Colors.ENDC} ({used_gb:.1f}GB used of {total_gb:.1f}GB)")
-        print(f"{Colors.HEADER}{'='*80}{Colors.ENDC}\n")
+        screen = Screen()
+        screen.line(f"\n{HR_HEADER}")
+        screen.line(f"{Colors.BOLD}Processing Alert: {hostname}:{mount_point}{Colors.ENDC}")
+        screen.line(f"  Usage: {Colors.WARNING}{usage_perc}%{Colors.ENDC} ({used_gb:.1f}GB used of {total_gb:.1f}GB)")
+        screen.line(f"{HR_HEADER}\n")
+        screen.flush()
 
         self.audit.log_ai_interaction('ALERT_START', hostname,
                                       command=f"disk:{mount_point}",
@@ -373,15 +732,33 @@ class InteractiveDiagnostic:
             'hostname': hostname,
             'mount_point': mount_point,
             'usage_percent': usage_perc,
-            'used_gb': round(used_gb, 2),
-            'total_gb': round(total_gb, 2),
-            'free_gb': round(free_gb, 2)
+            'used_gb': used_gb,
+            'total_gb': total_gb,
+            'free_gb': free_gb
         }
 
-        # Start interactive diagnosis
-        conversation_history = []
+        # Start interactive diagnosis - history is bounded so the context sent
+        # to the AI cannot outgrow the iteration budget
         max_iterations = 50
+        conversation_history = deque(maxlen=max_iterations)
         iteration = 0
+        executed_count = 0
+
+        # Seed history with the probe collected before the interactive phase
+        pending = self.initial_probes.get((hostname, mount_point))
+        probe = pending[0].result()[pending[1]] if pending else None
+        if probe and probe['success']:
+            print(f"{Colors.OKCYAN}Initial probe:{Colors.ENDC} {probe['command']}")
+            conversation_history.append({
+                'command': probe['command'],
+                'target_host': hostname,
+                'executed': True,
+                'stdout': _history_output(probe['stdout']),
+                'stderr': probe['stderr'],
+                'exit_code': probe['exit_code'],
+                'success': True
+            })
+            executed_count += 1
 
         print(f"{Colors.OKCYAN}Starting AI-driven interactive diagnosis (max {max_iterations} commands)...{Colors.ENDC}\n")
 
@@ -405,19 +782,20 @@ class InteractiveDiagnostic:
 
             # Check if AI is done
             if ai_response.get('done', False):
-                print(f"\n{Colors.OKGREEN}{'='*80}{Colors.ENDC}")
-                print(f"{Colors.OKGREEN}✓ AI diagnosis complete after {iteration-1} commands{Colors.ENDC}")
-                print(f"{Colors.OKGREEN}{'='*80}{Colors.ENDC}")
+                screen.line(f"\n{HR_OKGREEN}")
+                screen.line(f"{Colors.OKGREEN}✓ AI diagnosis complete after {iteration-1} commands{Colors.ENDC}")
+                screen.line(HR_OKGREEN)
 
                 # Display final analysis
                 if ai_response.get('final_analysis'):
-                    print(f"\n{Colors.BOLD}Final Analysis:{Colors.ENDC}")
-                    print(ai_response['final_analysis'])
+                    screen.line(f"\n{Colors.BOLD}Final Analysis:{Colors.ENDC}")
+                    screen.line(ai_response['final_analysis'])
 
                 if ai_response.get('recommended_actions'):
-                    print(f"\n{Colors.BOLD}Recommended Actions:{Colors.ENDC}")
+                    screen.line(f"\n{Colors.BOLD}Recommended Actions:{Colors.ENDC}")
                     for i, action in enumerate(ai_response['recommended_actions'], 1):
-                        print(f"  {i}. {action}")
+                        screen.line(f"  {i}. {action}")
+                screen.flush()
 
                 self.audit.log_ai_interaction('DIAGNOSIS_COMPLETE', hostname,
                                              response=ai_response.get('final_analysis', ''))
@@ -439,20 +817,25 @@ class InteractiveDiagnostic:
                     target_host = resolved
                 else:
                     # Default to alerting host if can't resolve
-                    print(f"{Colors.WARNING}Could not resolve host '{target_host}', using {hostname}{Colors.ENDC}")
+                    screen.line(f"{Colors.WARNING}Could not resolve host '{target_host}', using {hostname}{Colors.ENDC}")
                     target_host = hostname
 
             # Display AI's recommendation
-            print(f"\n{Colors.BOLD}AI Recommendation:{Colors.ENDC}")
-            print(f"  {Colors.OKCYAN}Target:{Colors.ENDC}  {target_host}")
-            print(f"  {Colors.OKCYAN}Command:{Colors.ENDC} {command}")
-            print(f"  {Colors.OKCYAN}Purpose:{Colors.ENDC} {explanation}")
+            screen.line(f"\n{Colors.BOLD}AI Recommendation:{Colors.ENDC}")
+            screen.line(f"  {Colors.OKCYAN}Target:{Colors.ENDC}  {target_host}")
+            screen.line(f"  {Colors.OKCYAN}Command:{Colors.ENDC} {command}")
+            screen.line(f"  {Colors.OKCYAN}Purpose:{Colors.ENDC} {explanation}")
 
             # Ask user for permission
-            print(f"\n{Colors.BOLD}Execute this command? (y/n/s=skip alert/q=quit): {Colors.ENDC}", end='')
-            user_input = input().strip().lower()
+            screen.line(f"\n{Colors.BOLD}Execute this command? (y/n/s=skip alert/q=quit): {Colors.ENDC}")
+            screen.flush(end='')
+            user_input = self._prompt()
 
-            if user_input == 'q':
+            if user_input is None:
+                print(f"\n{Colors.WARNING}No answer within {PROMPT_TIMEOUT}s. Skipping to next alert...{Colors.ENDC}")
+                self.audit.log_ai_interaction('COMMAND_AUTO_SKIP', hostname, command=command)
+                return False
+            elif user_input == 'q':
                 print(f"{Colors.WARNING}Quitting diagnosis...{Colors.ENDC}")
                 self.audit.log_ai_interaction('DIAGNOSIS_QUIT', hostname)
                 return False
@@ -481,18 +864,17 @@ class InteractiveDiagnostic:
 
             # Display result summary
             if result['success']:
-                print(f"{Colors.OKGREEN}✓ Command executed successfully{Colors.ENDC}")
+                screen.line(f"{Colors.OKGREEN}✓ Command executed successfully{Colors.ENDC}")
                 if result['stdout']:
-                    lines = result['stdout'].split('\n')[:20]
-                    print(f"\n{Colors.BOLD}Output:{Colors.ENDC}")
-                    for line in lines:
-                        print(f"  {line}")
-                    if len(result['stdout'].split('\n')) > 20:
-                        print(f"  {Colors.OKBLUE}... (truncated, {len(result['stdout'].split(chr(10)))} lines total){Colors.ENDC}")
+                    lines = result['stdout'].splitlines()
+                    screen.line(f"\n{Colors.BOLD}Output:{Colors.ENDC}")
+                    screen.line('\n'.join(f"  {line}" for line in lines[:20]))
+                    if len(lines) > 20:
+                        screen.line(f"  {Colors.OKBLUE}... (truncated, {len(lines)} lines total){Colors.ENDC}")
             else:
-                print(f"{Colors.FAIL}✗ Command failed{Colors.ENDC}")
+                screen.line(f"{Colors.FAIL}✗ Command failed{Colors.ENDC}")
                 if result.get('error_message'):
-                    print(f"  Error: {result['error_message']}")
+                    screen.line(f"  Error: {result['error_message']}")
 
                 if not result.get('stdout'):
                     result['stdout'] = f"Command failed: {result.get('error_message', 'Unknown error')}"
@@ -502,14 +884,16 @@ class InteractiveDiagnostic:
                 'command': command,
                 'target_host': target_host,
                 'executed': True,
-                'stdout': result.get('stdout', ''),
+                'stdout': _history_output(result.get('stdout', '')),
                 'stderr': result.get('stderr', ''),
                 'exit_code': result.get('exit_code', -1),
                 'success': result['success']
             })
+            executed_count += 1
 
             # Show progress
-            print(f"\n{Colors.OKBLUE}[Progress] {len([h for h in conversation_history if h.get('executed')])} commands executed{Colors.ENDC}")
+            screen.line(f"\n{Colors.OKBLUE}[Progress] {executed_count} commands executed{Colors.ENDC}")
+            screen.flush()
 
             self.audit.log_ai_interaction('COMMAND_EXECUTED', target_host,
                                          command=command,
@@ -519,42 +903,55 @@ class InteractiveDiagnostic:
             print(f"\n{Colors.WARNING}Reached maximum iterations ({max_iterations}). Ending diagnosis.{Colors.ENDC}")
             self.audit.log('WARNING', f'Max iterations reached for {hostname}')
 
-        print(f"\n{Colors.HEADER}{'='*80}{Colors.ENDC}")
+        print(f"\n{HR_HEADER}")
         return True
 
+    def _flush_audit(self):
+        """Write the alert's buffered audit entries to the DB in one batch
+
+        Flushing per alert rather than only at exit keeps the buffer well
+        below its cap, so long sessions do not lose their oldest entries.
+        """
+        if not self.db.audit_table:
+            return
+        try:
+            self.audit.flush_to_db(self.db)
+        except Exception as e:
+            self.audit.log('ERROR', 'Audit DB flush failed', {'error': str(e)})
+
     def run(self):
         """Main execution flow"""
-        print(f"""
-{Colors.HEADER}╔══════════════════════════════════════════════════════════════╗
-║                                                              ║
-║   {Colors.BOLD}HBAI-MON{Colors.ENDC}{Colors.HEADER} - Automated Disk Space Monitoring            ║
-║   Version 3.1.0 - Multi-host AI Diagnosis                    ║
-║                                                              ║
-╚══════════════════════════════════════════════════════════════╝{Colors.ENDC}
-        """)
+        print(BANNER)
 
-        self.audit.log('INFO', 'HBAI-MON started', {'user': os.getenv('USER', 'unknown')})
+        self.audit.log('INFO', 'HBAI-MON started', {'user': self.audit.user})
 
         # Check infrastructure file
-        if not os.path.exists(INFRASTRUCTURE_FILE):
+        if not self.infra.available:
             print(f"{Colors.WARNING}⚠ Infrastructure file not found: {INFRASTRUCTURE_FILE}{Colors.ENDC}")
             print(f"{Colors.WARNING}  AI will have limited context about your infrastructure.{Colors.ENDC}\n")
 
         # Get disk alerts
         print(f"{Colors.OKCYAN}Scanning for disk issues (excluding down hosts)...{Colors.ENDC}\n")
-        alerts = self.db.get_disk_alerts()
+        # Single pass over the alert stream: queue each alert and render its summary line
+        alerts = []
+        summary = io.StringIO()
+        for i, alert in enumerate(self.db.get_disk_alerts(), 1):
+            alerts.append(alert)
+            summary.write(f"  {i}. {alert['hostname']}:{alert['storage_descr']} - "
+                          f"{Colors.WARNING}{alert['storage_perc']}%{Colors.ENDC}\n")
 
         if not alerts:
             print(f"{Colors.OKGREEN}✓ No disk issues found{Colors.ENDC}")
             self.audit.log('INFO', 'No disk issues found')
             return
 
-        print(f"Found {Colors.WARNING}{len(alerts)}{Colors.ENDC} disk issues:\n")
-        for i, alert in enumerate(alerts, 1):
-            print(f"  {i}. {alert['hostname']}:{alert['storage_descr']} - "
-                  f"{Colors.WARNING}{alert['storage_perc']}%{Colors.ENDC}")
+        # Empty line after the list, before processing
+        sys.stdout.write(f"Found {Colors.WARNING}{len(alerts)}{Colors.ENDC} disk issues:\n\n"
+                         f"{summary.getvalue()}\n")
 
-        print()  # Empty line before processing
+        # Start the initial read-only probe on all hosts in parallel
+        print(f"{Colors.OKCYAN}Collecting initial disk usage from {len(alerts)} alerts in parallel...{Colors.ENDC}\n")
+        self.initial_probes = self.precollect(alerts)
 
         # Process each alert
         for i, alert in enumerate(alerts, 1):
@@ -566,7 +963,12 @@ class InteractiveDiagnostic:
                     # Check if user wants to continue to next alert or quit entirely
                     if i < len(alerts):
                         print(f"\n{Colors.BOLD}Continue to next alert? (y/n): {Colors.ENDC}", end='')
-                        if input().strip().lower() != 'y':
+                        answer = self._prompt()
+                        if answer is None:
+                            print(f"\n{Colors.WARNING}No answer within {PROMPT_TIMEOUT}s. Exiting...{Colors.ENDC}")
+                            self.audit.log('INFO', 'No operator answer, stopping after current alert')
+                            break
+                        if answer != 'y':
                             print(f"{Colors.WARNING}Exiting...{Colors.ENDC}")
                             break
             except KeyboardInterrupt:
@@ -577,9 +979,13 @@ class InteractiveDiagnostic:
                 print(f"\n{Colors.FAIL}Error processing alert: {e}{Colors.ENDC}")
                 self.audit.log('ERROR', f'Error processing alert for {alert["hostname"]}',
                              {'error': str(e)})
-                import traceback
                 traceback.print_exc()
                 continue
+            finally:
+                self._flush_audit()
+
+        # Drop probes for alerts the operator never reached
+        self._probe_pool.shutdown(wait=False, cancel_futures=True)
 
         print(f"\n{Colors.OKGREEN}✓ Session complete{Colors.ENDC}")
         self.audit.log('INFO', 'HBAI-MON completed')
@@ -611,6 +1017,8 @@ def main():
 
     try:
         db_manager = DatabaseManager(CREDENTIALS_FILE, audit)
+        if db_manager.audit_table:
+            audit.enable_db_buffer()
         diagnostic = InteractiveDiagnostic(db_manager, audit, ai_config)
         diagnostic.run()
 
@@ -620,11 +1028,15 @@ def main():
     except Exception as e:
         print(f"\n{Colors.FAIL}Fatal error: {e}{Colors.ENDC}")
         audit.log('ERROR', 'Fatal error', {'error': str(e)})
-        import traceback
         traceback.print_exc()
         sys.exit(1)
     finally:
         if 'db_manager' in locals():
+            if db_manager.audit_table:
+                try:
+                    audit.flush_to_db(db_manager)
+                except Exception as e:
+                    audit.log('ERROR', 'Audit DB flush failed', {'error': str(e)})
             db_manager.close_all()
 
 
@@ -7,12 +7,232 @@ Handles SSH connections through jumpserver with interactive cn script
 import paramiko
 import time
 import socket
-from typing import Dict, Optional
+import threading
+import re
+import shlex
+import functools
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Idle jumpserver connections kept per (jumpserver, user, key_file)
+POOL_MAX_PER_KEY = 8
+POOL_IDLE_TTL = 60
+
+# Concurrent diagnostics in execute_many - stay below the jumpserver's MaxSessions
+MAX_PARALLEL = 8
+
+# Status lines the expect script prints itself (not command output)
+EXPECT_NOTICES = frozenset((
+    b'ERROR: Connection timeout',
+    b'ERROR: Failed to connect',
+    b'WARNING: Command timeout - output may be incomplete',
+))
+
+# Connects to $TARGET_HOST via cn, becomes root and runs $EXEC_COMMAND.
+# Fed to 'expect -f -' on the jumpserver as pre-encoded bytes; per-call values
+# come from the environment.
+EXPECT_SCRIPT = rb'''set timeout 120
+log_user 1
+set target $env(TARGET_HOST)
+
+# Start cn to target host
+spawn cn $target
+
+# Variable to track if we got to the prompt
+set connected 0
+
+# Handle connection
+expect {
+#    "password:" {
+#        # Wait for password to be handled by cn
+#        exp_continue
+#    }
+    -re "(master|root)@$target" {
+        set connected 1
+        # Check if we need sudo
+        if {[string match "*master@*" $expect_out(0,string)]} {
+            send "sudo su\r"
+            expect -re "root@$target"
+        }
+    }
+    timeout {
+        puts "ERROR: Connection timeout"
+        exit 1
+    }
+}
+
+# Make sure we're connected
+if {$connected == 0} {
+    puts "ERROR: Failed to connect"
+    exit 1
+}
+# Let the session settle - swallow late MOTD/prompt output until it has been
+# quiet for a second, instead of a fixed sleep. Everything is consumed, so a
+# redrawn prompt cannot satisfy the completion match below.
+set timeout 1
+expect {
+    -re ".+" { exp_continue }
+    timeout {}
+}
+
+# Execute the commands
+send -- "$env(EXEC_COMMAND)\r"
+
+# Wait for the last command to complete and return to prompt
+set timeout $env(CMD_TIMEOUT)
+expect {
+    -re "root@$target.*#" {
+        # Command completed
+    }
+    timeout {
+        puts "WARNING: Command timeout - output may be incomplete"
+    }
+}
+
+# Exit cleanly
+send "exit\r"
+expect {
+    "master@$target" {
+        send "exit\r"
+    }
+    eof {}
+    timeout {}
+}
+
+expect eof
+'''
+
+# Whole-line ###CMD<i> / ###RC<exit code> markers written around each batched
+# command; ###DONE<seq> ends a run inside a persistent cn shell
+MARKER_RE = re.compile(rb'\s*###(CMD|RC|DONE)(\d+)\s*')
+
+# Commands made only of these characters are safe to splice into the batch
+# line as is; anything else (quotes ;|&<>$`#(){} newlines ...) runs under
+# bash -c - an unbalanced quote would otherwise swallow the ###RC marker
+_SIMPLE_RE = re.compile(r'[\w./\-=:,+@%*?~ ]+')
+
+# Persistent cn shells: login (cn + sudo) budget and idle lifetime
+SHELL_LOGIN_TIMEOUT = 120
+SHELL_IDLE_TTL = 300
+
+_POOL: Dict[tuple, deque] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def close_pool():
+    """Close every idle pooled jumpserver connection"""
+    with _POOL_LOCK:
+        for idle in _POOL.values():
+            while idle:
+                idle.pop()[0].close()
+
+
+atexit.register(close_pool)
+
+
+@functools.lru_cache(maxsize=1024)
+def _short(hostname: str) -> str:
+    """Hostname without its domain part"""
+    return hostname.partition('.')[0]
+
+
+def _parse_markers(lines, count: int, done: Optional[int] = None):
+    """Split marker-delimited output into per-command lines, exit codes and notices
+    
+    Marker lines are exact, so an echoed command line never matches. Lines are
+    matched as bytes; only the kept output is decoded later. Stops at ###DONE<done>.
+    """
+    outputs = [[] for _ in range(count)]
+    exit_codes = [None] * count
+    notices = []
+    current = None
+    
+    for raw_line in lines:
+        line = raw_line.rstrip(b'\r\n')
+        marker = MARKER_RE.fullmatch(line)
+        if marker:
+            kind, number = marker.group(1), int(marker.group(2))
+            if kind == b'CMD':
+                current = number if number < count else None
+            elif kind == b'RC':
+                if current is not None:
+                    exit_codes[current] = number
+                    current = None
+            elif number == done:
+                break
+        elif line.strip() in EXPECT_NOTICES:
+            notices.append(line.strip().decode())
+        elif current is not None:
+            outputs[current].append(line)
+    
+    return outputs, exit_codes, notices
+
+
+def _recv(channel: paramiko.Channel, deadline: float) -> bytes:
+    """Next chunk from an interactive channel, raising socket.timeout at the deadline"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout('timed out waiting for cn shell output')
+    channel.settimeout(remaining)
+    chunk = channel.recv(65536)
+    if not chunk:
+        raise EOFError('cn shell closed')
+    return chunk
+
+
+def _shell_lines(channel: paramiko.Channel, timeout: float):
+    """Yield complete output lines from an interactive channel until the timeout"""
+    deadline = time.monotonic() + timeout
+    pending = b''
+    while True:
+        *lines, pending = (pending + _recv(channel, deadline)).split(b'\n')
+        yield from lines
+
+
+class CnShell:
+    """Long-lived root shell on one target host, opened through cn on the jumpserver
+    
+    Holds its own jumpserver connection. Callers serialize on `lock`; `seq`
+    numbers the runs so every one ends on its own ###DONE marker.
+    """
+    
+    def __init__(self, target_host: str):
+        self.target_host = target_host
+        self.ssh_client = None
+        self.channel = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.seq = 0
+    
+    def is_open(self) -> bool:
+        return self.channel is not None and not self.channel.closed
 
 
 class CommandExecutor:
     """Execute commands via SSH through jumpserver"""
     
+    # Shared executors by (jumpserver, user, key_file), see instance()
+    _instances: Dict[tuple, 'CommandExecutor'] = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def instance(cls, ssh_config: dict, audit_logger) -> 'CommandExecutor':
+        """Shared executor for this jumpserver/user/key
+        
+        Reusing one executor keeps its cn shells and reachability cache warm
+        across callers. Only call close() on it at process shutdown.
+        """
+        key = (ssh_config.get('jumpserver', 'hbcsrv14'),
+               ssh_config.get('jumpserver_user', 'master'),
+               ssh_config.get('key_file', '/root/.ssh/id_rsa'))
+        with cls._instances_lock:
+            executor = cls._instances.get(key)
+            if executor is None:
+                executor = cls._instances[key] = cls(ssh_config, audit_logger)
+        return executor
+    
     def __init__(self, ssh_config: dict, audit_logger):
         self.jumpserver = ssh_config.get('jumpserver', 'hbcsrv14')
         self.jumpserver_user = ssh_config.get('jumpserver_user', 'master')
@@ -26,12 +246,200 @@ class CommandExecutor:
             'user': self.jumpserver_user,
             'key_file': self.jumpserver_key
         })
+        self._pool_key = (self.jumpserver, self.jumpserver_user, self.jumpserver_key)
+        
+        # Recent test_connectivity() answers: hostname -> (checked_at, reachable)
+        self._reach_cache = {}
+        self._reach_ttl = 30.0
+        self._reach_lock = threading.Lock()
+        
+        # One cn shell per target host is kept open and reused, so cn login
+        # and sudo are paid once instead of per diagnostic
+        self.persistent_shell = str(ssh_config.get('persistent_shell', 'yes')).lower() not in ('no', 'false', '0')
+        self._shells: Dict[str, CnShell] = {}
+        self._shells_lock = threading.Lock()
+        atexit.register(self.close_shells)
+    
+    def get_connection(self) -> paramiko.SSHClient:
+        """Check out a live jumpserver connection, reusing an idle pooled one if possible"""
+        now = time.monotonic()
+        with _POOL_LOCK:
+            idle = _POOL.setdefault(self._pool_key, deque())
+            while idle:
+                ssh_client, last_used = idle.pop()
+                transport = ssh_client.get_transport()
+                if now - last_used < POOL_IDLE_TTL and transport and transport.is_active():
+                    self.audit.log('DEBUG', f'Reusing pooled connection to {self.jumpserver}')
+                    return ssh_client
+                ssh_client.close()
+
+        ssh_client = paramiko.SSHClient()
+        ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        
+        self.audit.log('DEBUG', f'Connecting to {self.jumpserver} as {self.jumpserver_user}')
+        
+        try:
+            ssh_client.connect(
+                hostname=self.jumpserver,
+                username=self.jumpserver_user,
+                key_filename=self.jumpserver_key,
+                timeout=self.timeout,
+                look_for_keys=True,
+                allow_agent=True
+            )
+        except Exception:
+            ssh_client.close()
+            raise
+        
+        # Keepalives let the pool notice dead jumpserver sessions; TCP_NODELAY
+        # avoids Nagle/delayed-ACK stalls on the many tiny channel messages
+        transport = ssh_client.get_transport()
+        transport.set_keepalive(15)
+        try:
+            transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass  # not a TCP socket (e.g. ProxyCommand)
+        
+        self.audit.log('INFO', f'Connected to {self.jumpserver}')
+        return ssh_client
+    
+    def return_connection(self, ssh_client: paramiko.SSHClient):
+        """Hand a connection back to the pool, or close it if dead or the pool is full"""
+        transport = ssh_client.get_transport()
+        if transport and transport.is_active():
+            with _POOL_LOCK:
+                idle = _POOL.setdefault(self._pool_key, deque())
+                if len(idle) < POOL_MAX_PER_KEY:
+                    idle.append((ssh_client, time.monotonic()))
+                    return
+        ssh_client.close()
+    
+    def _get_shell(self, target_host: str) -> CnShell:
+        """Shell slot for target_host; idle shells of other hosts are reaped on the way"""
+        now = time.monotonic()
+        with self._shells_lock:
+            for host, shell in list(self._shells.items()):
+                if now - shell.last_used > SHELL_IDLE_TTL and shell.lock.acquire(blocking=False):
+                    try:
+                        self._close_shell(shell)
+                    finally:
+                        shell.lock.release()
+                    del self._shells[host]
+            shell = self._shells.get(target_host)
+            if shell is None:
+                shell = self._shells[target_host] = CnShell(target_host)
+        return shell
+    
+    def _open_shell(self, shell: CnShell):
+        """Log in with cn, become root and quiet the shell (echo and prompt off)"""
+        target = shell.target_host
+        shell.ssh_client = self.get_connection()
+        try:
+            shell.channel = shell.ssh_client.invoke_shell(width=4096)
+        except paramiko.SSHException:
+            # Jumpserver refuses interactive shells - callers fall back to expect
+            self.return_connection(shell.ssh_client)
+            shell.ssh_client = None
+            raise
+        
+        deadline = time.monotonic() + SHELL_LOGIN_TIMEOUT
+        prompt = re.compile(rb'(master|root)@' + re.escape(target.encode()))
+        try:
+            shell.channel.send(f"cn {shlex.quote(target)}\r")
+            seen = b''
+            match = None
+            while not match:
+                seen += _recv(shell.channel, deadline)
+                match = prompt.search(seen)
+            if match.group(1) == b'master':
+                shell.channel.send("sudo su\r")
+                seen = seen[match.end():]
+                while b'root@' + target.encode() not in seen:
+                    seen += _recv(shell.channel, deadline)
+            
+            # Everything up to the ready marker (MOTD, prompts) is discarded
+            shell.channel.send("stty -echo; unset PROMPT_COMMAND; PS1=''; PS2=''; echo '###DONE0'\r")
+            _parse_markers(_shell_lines(shell.channel, deadline - time.monotonic()), 0, done=0)
+        except socket.timeout:
+            self._close_shell(shell)
+            raise ConnectionError(f'cn login to {target} timed out')
+        except Exception:
+            self._close_shell(shell)
+            raise
+        
+        self.audit.log('INFO', f'Opened persistent cn shell on {target}')
+    
+    def _run_in_shell(self, shell: CnShell, exec_command: str, count: int):
+        """Run a marker-delimited command line in an open shell and collect its output"""
+        # Drop anything left over from the previous run
+        while shell.channel.recv_ready():
+            shell.channel.recv(65536)
+        
+        # Subshell with stdin from /dev/null: a stray exit/cd cannot change the
+        # kept shell and an interactive command cannot hang on the tty
+        shell.seq += 1
+        shell.channel.send(f"( {exec_command} ) < /dev/null; echo '###DONE{shell.seq}'\r")
+        try:
+            parsed = _parse_markers(_shell_lines(shell.channel, 60 * count), count, done=shell.seq)
+        except socket.timeout:
+            # The shell is in an unknown state - do not reuse it
+            self._close_shell(shell)
+            raise TimeoutError(f'Command timed out after {60 * count} seconds')
+        except EOFError:
+            self._close_shell(shell)
+            raise
+        shell.last_used = time.monotonic()
+        return parsed
+    
+    def _close_shell(self, shell: CnShell):
+        """Close a shell's channel (cn gets a hangup) and give its connection back"""
+        if shell.channel is not None:
+            shell.channel.close()
+            shell.channel = None
+        if shell.ssh_client is not None:
+            self.return_connection(shell.ssh_client)
+            shell.ssh_client = None
+    
+    def close_shells(self):
+        """Close every persistent cn shell"""
+        with self._shells_lock:
+            for shell in self._shells.values():
+                self._close_shell(shell)
+            self._shells.clear()
+    
+    def close(self):
+        """Close this executor's shells and drop it from the shared instances"""
+        with self._instances_lock:
+            if self._instances.get(self._pool_key) is self:
+                del self._instances[self._pool_key]
+        self.close_shells()
+    
+    def _wrap_command(self, command: str) -> str:
+        """Quote a command for the batch line - plain commands run directly, the
+        rest under bash -c so shell syntax cannot leak into the markers"""
+        if _SIMPLE_RE.fullmatch(command):
+            return command
+        return 'bash -c ' + shlex.quote(command)
     
     def execute_single_diagnostic(self, hostname: str, command: str) -> Dict:
         """Execute a single diagnostic command on target host via jumpserver"""
+        return self.execute_batch(hostname, [command])[0]
+    
+    def execute_batch(self, hostname: str, commands: List[str],
+                      ssh_client: Optional[paramiko.SSHClient] = None) -> List[Dict]:
+        """Execute several diagnostic commands on one target host in a single cn session
+        
+        The commands are sent as one shell line with ###CMD<i> / ###RC<exit code>
+        markers around each, so the output and exit status of every command can
+        be recovered while cn connects (and sudo's) only once. With
+        persistent_shell (the default) the line goes to the host's kept-open cn
+        shell; otherwise, or if the jumpserver refuses a shell, a one-off expect
+        session runs it. A caller-supplied ssh_client is only used for the
+        expect session, as is, and not returned to the pool.
+        """
         
-        start_time = time.time()
-        result = {
+        start_time = time.perf_counter()
+        results = [{
             'command': command,
             'hostname': hostname,
             'success': False,
@@ -40,200 +448,169 @@ class CommandExecutor:
             'exit_code': -1,
             'execution_time': 0,
             'error_message': None
-        }
+        } for command in commands]
+        if not commands:
+            return results
+        
+        # Extract just the hostname without domain if present
+        target_host = _short(hostname)
+        
+        # One shell line: echo '###CMD0'; cmd0; echo "###RC$?"; echo '###CMD1'; ...
+        exec_command = '; '.join(
+            f"echo '###CMD{i}'; {self._wrap_command(command)}; echo \"###RC$?\""
+            for i, command in enumerate(commands)
+        )
+        
+        if self.audit.is_enabled('DEBUG'):
+            self.audit.log('DEBUG', f'Executing {len(commands)} command(s) on {target_host}: {commands[0][:100]}...')
         
-        ssh_client = None
         try:
-            # Connect to jumpserver
-            ssh_client = paramiko.SSHClient()
-            ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            self.audit.log('DEBUG', f'Connecting to {self.jumpserver} as {self.jumpserver_user}')
-            
-            # Connect to jumpserver
-            ssh_client.connect(
-                hostname=self.jumpserver,
-                username=self.jumpserver_user,
-                key_filename=self.jumpserver_key,
-                timeout=self.timeout,
-                look_for_keys=True,
-                allow_agent=True
-            )
+            parsed = None
+            if self.persistent_shell:
+                shell = self._get_shell(target_host)
+                with shell.lock:
+                    try:
+                        if not shell.is_open():
+                            self._open_shell(shell)
+                    except paramiko.SSHException as e:
+                        self.audit.log('WARNING', f'No interactive shell on {self.jumpserver}, using expect: {e}')
+                    else:
+                        parsed = self._run_in_shell(shell, exec_command, len(commands))
+                exit_code = -1
+            if parsed is None:
+                parsed, exit_code = self._run_expect(target_host, exec_command, len(commands), ssh_client)
+            outputs, exit_codes, notices = parsed
+            connection_error = next((n for n in notices if n.startswith('ERROR:')), None)
             
-            self.audit.log('INFO', f'Connected to {self.jumpserver}')
-            
-            # Extract just the hostname without domain if present
-            target_host = hostname.split('.')[0] if '.' in hostname else hostname
-            
-            # For complex commands with pipes, we need to escape them properly
-            # and wrap in bash -c to ensure proper execution
-            if '|' in command or '>' in command or ';' in command:
-                # Escape single quotes in command and wrap in bash -c
-                escaped_cmd = command.replace("'", "'\\''")
-                exec_command = f"bash -c '{escaped_cmd}'"
-            else:
-                exec_command = command
-            
-            # Create expect script that handles command execution
-            expect_script = f'''#!/usr/bin/expect -f
-set timeout 120
-log_user 1
-
-# Start cn to target host
-spawn cn {target_host}
-
-# Variable to track if we got to the prompt
-set connected 0
-
-# Handle connection
-expect {{
-#    "password:" {{
-#        # Wait for password to be handled by cn
-#        exp_continue
-#    }}
-    -re "(master|root)@{target_host}" {{
-        set connected 1
-        # Check if we need sudo
-        if {{[string match "*master@*" $expect_out(0,string)]}} {{
-            send "sudo su\\r"
-            expect -re "root@{target_host}"
-        }}
-    }}
-    timeout {{
-        puts "ERROR: Connection timeout"
-        exit 1
-    }}
-}}
-
-# Make sure we're connected
-if {{$connected == 0}} {{
-    puts "ERROR: Failed to connect"
-    exit 1
-}}
-sleep 10
-# Execute the command
-send "{exec_command}\\r"
-
-# Wait for command to complete and return to prompt
-set timeout 60
-expect {{
-    -re "root@{target_host}.*#" {{
-        # Command completed
-    }}
-    timeout {{
-        puts "WARNING: Command timeout - output may be incomplete"
-    }}
-}}
-
-# Exit cleanly
-send "exit\\r"
-expect {{
-    "master@{target_host}" {{
-        send "exit\\r"
-    }}
-    eof {{}}
-    timeout {{}}
-}}
-
-expect eof
-'''
-            
-            # Write expect script to temp file
-            temp_script_name = f"/tmp/cn_exec_{int(time.time())}.expect"
-            write_script_cmd = f"cat > {temp_script_name} << 'EOFSCRIPT'\n{expect_script}\nEOFSCRIPT"
-            
-            # Write the expect script
-            stdin, stdout, stderr = ssh_client.exec_command(write_script_cmd)
-            stdout.read()  # Wait for completion
-            
-            # Make it executable
-            ssh_client.exec_command(f"chmod +x {temp_script_name}")
-            
-            # Execute the expect script and capture output
-            self.audit.log('DEBUG', f'Executing command on {target_host}: {command[:100]}...')
-            
-            stdin, stdout, stderr = ssh_client.exec_command(
-                f"expect -f {temp_script_name} 2>&1",
-                timeout=max(self.timeout * 3, 180)  # Give plenty of time
-            )
-            
-            # Get raw output
-            raw_output = stdout.read().decode('utf-8', errors='replace')
-            exit_code = stdout.channel.recv_exit_status()
-            
-            # Clean up temp script
-            try:
-                ssh_client.exec_command(f"rm -f {temp_script_name}")
-            except:
-                pass  # Don't fail if cleanup fails
-            
-            # Process and clean the output
-            lines = raw_output.split('\n')
-            output_lines = []
-            capture = False
-            
-            for line in lines:
-                # Start capturing after we see the command being executed
-                if exec_command in line or command in line:
-                    capture = True
-                    continue
-                    
-                # Stop at the next prompt or exit
-                if capture:
-                    if 'root@' in line and '#' in line:
-                        break
-                    if 'master@' in line:
-                        break
-                    if line.strip() == 'exit':
-                        break
-                    if 'ERROR:' in line or 'WARNING:' in line:
-                        if 'ERROR:' in line:
-                            result['error_message'] = line
-                        continue
-                        
-                    output_lines.append(line)
-            
-            # Join output, removing empty lines at start/end
-            result['stdout'] = '\n'.join(output_lines).strip()
-            
-            # Determine success
-            # Consider successful if we got output and no ERROR messages
-            has_output = len(result['stdout']) > 10  # More than trivial output
-            no_connection_error = 'ERROR: Connection timeout' not in raw_output and 'ERROR: Failed to connect' not in raw_output
-            
-            result['success'] = has_output and no_connection_error
-            result['exit_code'] = 0 if result['success'] else exit_code
-            
-            if result['success']:
-                self.audit.log('INFO', f'Command executed successfully on {target_host}')
-            else:
-                self.audit.log('WARNING', f'Command may have failed on {target_host}', {
-                    'has_output': has_output,
-                    'output_length': len(result['stdout']),
-                    'error': result.get('error_message', 'Unknown')
-                })
+            for result, lines, rc in zip(results, outputs, exit_codes):
+                # Join output, removing empty lines at start/end
+                result['stdout'] = b'\n'.join(lines).decode('utf-8', errors='replace').strip()
+                
+                if connection_error:
+                    result['error_message'] = connection_error
+                    result['exit_code'] = exit_code
+                elif rc is None:
+                    result['error_message'] = 'No exit status received - command timed out or output incomplete'
+                else:
+                    result['exit_code'] = rc
+                    result['success'] = (rc == 0)
+                    if rc != 0:
+                        result['error_message'] = f"Exit code: {rc}"
+                
+                if result['success']:
+                    self.audit.log('INFO', f'Command executed successfully on {target_host}')
+                else:
+                    self.audit.log('WARNING', f'Command may have failed on {target_host}', {
+                        'command': result['command'][:100],
+                        'output_length': len(result['stdout']),
+                        'error': result['error_message'] or 'Unknown'
+                    })
                 
                 # If no output but no error either, provide a message
-                if not has_output and no_connection_error:
+                if not result['stdout'] and not connection_error:
                     result['stdout'] = '(No output returned from command)'
             
         except Exception as e:
-            result['error_message'] = f"Execution error: {str(e)}"
+            for result in results:
+                result['error_message'] = f"Execution error: {str(e)}"
             self.audit.log('ERROR', 'Command execution failed', {
                 'error': str(e),
                 'hostname': hostname,
-                'command': command[:100]
+                'command': commands[0][:100]
             })
             
         finally:
-            if ssh_client:
-                ssh_client.close()
+            elapsed = round(time.perf_counter() - start_time, 2)
+            for result in results:
+                result['execution_time'] = elapsed
+        
+        return results
+    
+    def _run_expect(self, target_host: str, exec_command: str, count: int,
+                    ssh_client: Optional[paramiko.SSHClient] = None):
+        """Run a marker-delimited command line in a one-off cn session driven by expect"""
+        own_client = ssh_client is None
+        # Connect to jumpserver (pooled - the handshake is paid once per connection)
+        if own_client:
+            ssh_client = self.get_connection()
+        try:
+            # Execute the expect script, fed over stdin - one channel, no temp file.
+            # Per-call values travel as environment variables, so the script itself
+            # is constant and the command is never re-parsed by Tcl
+            stdin, stdout, stderr = ssh_client.exec_command(
+                f"TARGET_HOST={shlex.quote(target_host)} "
+                f"EXEC_COMMAND={shlex.quote(exec_command)} "
+                f"CMD_TIMEOUT={60 * count} "
+                "expect -f - 2>&1",
+                timeout=max(self.timeout * 3, 180)  # Give plenty of time
+            )
+            stdin.write(EXPECT_SCRIPT)  # already bytes - no per-call encode
+            stdin.channel.shutdown_write()
             
-            result['execution_time'] = round(time.time() - start_time, 2)
+            # Split the output on the markers as it streams in - only lines
+            # inside a command's markers are kept in memory
+            parsed = _parse_markers(stdout.channel.makefile('rb'), count)
+            return parsed, stdout.channel.recv_exit_status()
+        finally:
+            if own_client:
+                self.return_connection(ssh_client)
+    
+    def execute_many(self, pairs: List[Tuple[str, str]]) -> List[Dict]:
+        """Run (hostname, command) pairs concurrently; results keep the input order
+        
+        Hosts with a persistent cn shell run on it. Without persistent shells all
+        workers share one pooled jumpserver connection, each on its own SSH
+        channel, so the channel opens overlap instead of every worker paying
+        for a separate handshake.
+        """
+        if not pairs:
+            return []
+        
+        shared = None
+        if not self.persistent_shell:
+            try:
+                shared = self.get_connection()
+            except Exception as e:
+                # Let each diagnostic connect (and report the failure) on its own
+                self.audit.log('WARNING', f'Shared connection to {self.jumpserver} failed: {e}')
+        
+        def run(pair: Tuple[str, str]) -> Dict:
+            return self.execute_batch(pair[0], [pair[1]], ssh_client=shared)[0]
         
-        return result
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(pairs), MAX_PARALLEL)) as pool:
+                return list(pool.map(run, pairs))
+        finally:
+            if shared:
+                self.return_connection(shared)
     
     def test_connectivity(self, hostname: str) -> bool:
-        """Test if host is reachable via jumpserver"""
+        """Test if host is reachable via jumpserver (answers cached for a few seconds)"""
+        with self._reach_lock:
+            checked_at, reachable = self._reach_cache.get(hostname, (float('-inf'), None))
+        if time.monotonic() - checked_at < self._reach_ttl:
+            return reachable
+        
         result = self.execute_single_diagnostic(hostname, "echo 'connectivity test'")
-        return result['success']
+        reachable = result['success']
+        with self._reach_lock:
+            self._reach_cache[hostname] = (time.monotonic(), reachable)
+        return reachable
+    
+    def test_connectivity_many(self, hostnames: List[str]) -> Dict[str, bool]:
+        """Reachability of several hosts; the ones not cached are probed concurrently"""
+        now = time.monotonic()
+        answers = {}
+        with self._reach_lock:
+            for hostname in hostnames:
+                checked_at, reachable = self._reach_cache.get(hostname, (float('-inf'), None))
+                if now - checked_at < self._reach_ttl:
+                    answers[hostname] = reachable
+        
+        unknown = [hostname for hostname in dict.fromkeys(hostnames) if hostname not in answers]
+        results = self.execute_many([(hostname, "echo 'connectivity test'") for hostname in unknown])
+        with self._reach_lock:
+            for hostname, result in zip(unknown, results):
+                self._reach_cache[hostname] = (time.monotonic(), result['success'])
+                answers[hostname] = result['success']
+        return answers
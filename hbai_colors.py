@@ -0,0 +1,28 @@
+"""
+Terminal colors shared by the HBAI-MON modules
+"""
+
+import sys
+
+
+class Colors:
+    """ANSI color codes for terminal output"""
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+# No escape codes when output is piped or redirected (e.g. cron mail)
+if not sys.stdout.isatty():
+    for _name in ('HEADER', 'OKBLUE', 'OKCYAN', 'OKGREEN', 'WARNING',
+                  'FAIL', 'ENDC', 'BOLD', 'UNDERLINE'):
+        setattr(Colors, _name, '')
+
+# Horizontal rule used in banners and prompt sections
+SEP = '=' * 80
@@ -4,143 +4,335 @@ Command Executor Module for HBAI-MON v3
 Uses cn script with base64 encoding for bulletproof command execution
 """
 
+import os
 import subprocess
+import asyncio
 import time
-import base64
+import binascii
 import re
+import shlex
 import configparser
-from typing import Dict
+import atexit
+import shutil
+import tempfile
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Default concurrency for execute_many - all sessions share one ControlMaster
+# connection, so stay below the jumpserver's MaxSessions/MaxStartups (10)
+MAX_PARALLEL = 8
+
+# Per-command marker line printed by execute_batch scripts
+_BATCH_MARKER_RE = re.compile(r'^===CMD_(\d+)_RC=(\d+)===$\n?', re.MULTILINE)
+
+# MySQL credential expansion (_expand_mysql_command)
+_MYSQL_PREFIX_RE = re.compile(r'^(mysql(?:admin|dump)?)\s+')
+
+# Characters that end a simple command when unquoted (pipes, lists, redirects)
+_SHELL_OPERATORS = frozenset('|&;<>()\n')
+
+
+def _b64(text: str) -> str:
+    """Base64 encode a command for cn --b64 (single C call, no trailing newline)"""
+    return binascii.b2a_base64(text.encode('utf-8'), newline=False).decode('ascii')
+
+
+@functools.lru_cache(maxsize=1024)
+def _short(hostname: str) -> str:
+    """Hostname without its domain part"""
+    return hostname.partition('.')[0]
+
+
+def _split_shell_tail(command: str) -> Tuple[str, str]:
+    """Split a command line at its first unquoted shell operator
+    
+    Returns the leading simple command and the untouched rest (e.g. '2>&1 | grep x').
+    A redirect's file descriptor number goes with the rest.
+    """
+    quote = None
+    escaped = False
+    for i, c in enumerate(command):
+        if escaped:
+            escaped = False
+        elif quote:
+            if c == quote:
+                quote = None
+            elif c == '\\' and quote == '"':
+                escaped = True
+        elif c == '\\':
+            escaped = True
+        elif c in '\'"':
+            quote = c
+        elif c in _SHELL_OPERATORS:
+            head = command[:i]
+            fd_less = head.rstrip('0123456789')
+            if fd_less != head and fd_less[-1:].isspace():
+                head = fd_less
+            return head, command[len(head):]
+    return command, ''
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_mysql_command(command: str) -> Tuple[str, object]:
+    """Classify a command for MySQL credential expansion
+    
+    Returns ('expand', (cmd_type, rest, tail)) when our credentials should be
+    inserted, otherwise (verdict, detail) with verdict one of 'not-mysql',
+    'unparsable' (detail: the parse error), 'real-password' or 'no-password'.
+    Pure function of the command, so repeated AI commands skip the tokenizing.
+    """
+    match = _MYSQL_PREFIX_RE.match(command)
+    if not match:
+        return 'not-mysql', None
+    
+    # One tokenize of the mysql part, then a single scan over its arguments.
+    # Pipes/redirects after it are kept verbatim.
+    head, tail = _split_shell_tail(command)
+    try:
+        tokens = shlex.split(head)
+    except ValueError as e:
+        return 'unparsable', str(e)
+    
+    # -p / -p'password' / --password[=password] ask for our credentials, any
+    # other attached -pSECRET / --password=SECRET is a real inline password.
+    # -u USER / -uUSER is dropped, we add our own user back.
+    needs_expansion = False
+    rest = []
+    skip_next = False
+    for tok in tokens[1:]:
+        if skip_next:
+            skip_next = False
+        elif tok in ('-p', '--password'):
+            needs_expansion = True
+        elif tok.startswith('--password='):
+            if tok[11:].lower() != 'password':
+                return 'real-password', None
+            needs_expansion = True
+        elif tok.startswith('-p') and not tok.startswith('--'):
+            if tok[2:].lower() != 'password':
+                return 'real-password', None
+            needs_expansion = True
+        elif tok == '-u':
+            skip_next = True
+        elif not tok.startswith('-u'):
+            rest.append(tok)
+    
+    if not needs_expansion:
+        return 'no-password', None
+    return 'expand', (match.group(1), tuple(rest), tail.lstrip())
 
 
 class CommandExecutor:
     """Execute commands via cn script with base64 encoding"""
     
+    # Shared executors by (jumpserver, user, credentials_file), see instance()
+    _instances: Dict[tuple, 'CommandExecutor'] = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def instance(cls, ssh_config: dict, audit_logger,
+                 credentials_file: str = None) -> 'CommandExecutor':
+        """Shared executor for this jumpserver/user/credentials
+        
+        Reusing one executor keeps its ControlMaster connection and
+        reachability cache warm across callers. Only call close() on it at
+        process shutdown.
+        """
+        key = (ssh_config.get('jumpserver', 'hbcsrv14'),
+               ssh_config.get('jumpserver_user', 'master'),
+               credentials_file)
+        with cls._instances_lock:
+            executor = cls._instances.get(key)
+            if executor is None:
+                executor = cls._instances[key] = cls(ssh_config, audit_logger, credentials_file)
+        return executor
+    
     def __init__(self, ssh_config: dict, audit_logger, credentials_file: str = None):
         self.jumpserver = ssh_config.get('jumpserver', 'hbcsrv14')
         self.jumpserver_user = ssh_config.get('jumpserver_user', 'master')
         self.cn_script = 'cn'
         self.timeout = int(ssh_config.get('timeout', 120))
         self.audit = audit_logger
+        self._instance_key = (self.jumpserver, self.jumpserver_user, credentials_file)
+        
+        # Multiplex all commands over one authenticated jumpserver connection
+        # (multiplex = no turns it off). Without a configured control_path the
+        # socket lives in a private temp dir that is removed again at exit.
+        self.multiplex = str(ssh_config.get('multiplex', 'yes')).lower() not in ('no', 'false', '0')
+        self.ssh_opts = ['-o', 'ServerAliveInterval=15']
+        self._cm_dir = None
+        self._master = None
+        if self.multiplex:
+            control_path = ssh_config.get('control_path')
+            if not control_path:
+                self._cm_dir = tempfile.mkdtemp(prefix='hbai-cm-')
+                control_path = f"{self._cm_dir}/cm-%C"
+            self.ssh_opts += [
+                '-o', 'ControlMaster=auto',
+                '-o', f"ControlPath={control_path}",
+                '-o', f"ControlPersist={ssh_config.get('control_persist', '60')}",
+            ]
+            # Bring the master up in the background now, so its handshake
+            # overlaps startup instead of delaying the first diagnostic. Its
+            # stdio goes to /dev/null - a persisting master must not hold the
+            # pipes of a later capture_output run open.
+            try:
+                self._master = subprocess.Popen(
+                    ['ssh', '-o', 'LogLevel=ERROR', '-o', 'BatchMode=yes', *self.ssh_opts,
+                     f'{self.jumpserver_user}@{self.jumpserver}', 'true'],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except OSError as e:
+                self.audit.log('WARNING', f'Could not start SSH master for {self.jumpserver}: {e}')
+            atexit.register(self._close_master)
+        
+        # Recent test_connectivity() answers: hostname -> (checked_at, reachable)
+        self._reach_cache = {}
+        self._reach_ttl = 30.0
+        self._reach_lock = threading.Lock()
         
         # Load credentials for MySQL command expansion
         self.credentials = None
+        self._mysql_hosts = {}
+        # Resolved (user, password) - or None - per hostname
+        self._cred_cache: Dict[str, Optional[Tuple[str, str]]] = {}
+        self._credentials_file = credentials_file
+        self._credentials_mtime = None
+        self._credentials_checked = 0.0
         if credentials_file:
-            self.credentials = configparser.ConfigParser()
-            self.credentials.read(credentials_file)
+            self._load_credentials()
+    
+    def close(self):
+        """Stop the multiplexing master and drop this executor from the shared instances"""
+        with self._instances_lock:
+            if self._instances.get(self._instance_key) is self:
+                del self._instances[self._instance_key]
+        self._close_master()
     
+    def _close_master(self):
+        """Stop the multiplexing master and remove its private socket dir"""
+        if not self.multiplex:
+            return
+        if self._master and self._master.poll() is None:
+            self._master.kill()
+            self._master.wait()
+        try:
+            subprocess.run(
+                ['ssh', '-O', 'exit', *self.ssh_opts, f'{self.jumpserver_user}@{self.jumpserver}'],
+                capture_output=True,
+                timeout=5
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        if self._cm_dir:
+            shutil.rmtree(self._cm_dir, ignore_errors=True)
+
     def _expand_mysql_command(self, command: str, hostname: str) -> str:
         """Expand MySQL commands with credentials if available"""
         
-        if not self.credentials:
-            self.audit.log('WARNING', 'No credentials available for MySQL expansion')
+        # Nearly every diagnostic command is not MySQL - a plain prefix test
+        # rejects those without a cache lookup or regex match
+        if not command.startswith('mysql'):
             return command
         
-        # Check if this is a MySQL command that needs credentials
-        mysql_patterns = [
-            (r'^mysql\s+', 'mysql'),
-            (r'^mysqladmin\s+', 'mysqladmin'),
-            (r'^mysqldump\s+', 'mysqldump'),
-        ]
-        
-        cmd_type = None
-        for pattern, cmd_name in mysql_patterns:
-            if re.match(pattern, command):
-                cmd_type = cmd_name
-                break
-        
-        if not cmd_type:
-            # Not a MySQL command
+        verdict, detail = _parse_mysql_command(command)
+        if verdict == 'not-mysql':
             return command
         
-        self.audit.log('DEBUG', f'Detected MySQL command type: {cmd_type}')
-        
-        # Check various password patterns
-        # Pattern 1: -p'password' or -p"password" or -ppassword (placeholder)
-        has_placeholder = re.search(r"-p['\"]?password['\"]?", command, re.IGNORECASE)
-        
-        # Pattern 2: -p followed by space then non-password argument (interactive mode)
-        # This catches: -p status, -p -e, -p --verbose, etc.
-        has_interactive = re.search(r'-p\s+[^\'"\s]', command) and not re.search(r'-p\S', command)
-        
-        # Pattern 3: -p at end of command
-        has_p_at_end = re.search(r'-p\s*$', command)
-        
-        # Pattern 4: -p with nothing attached (standalone -p followed by space or end)
-        has_standalone_p = re.search(r'-p(?=\s|$)', command) and not re.search(r'-p\S', command)
-        
-        self.audit.log('DEBUG', f'Password detection: placeholder={has_placeholder}, interactive={has_interactive}, at_end={has_p_at_end}, standalone={has_standalone_p}')
-        
-        # Check if it already has a REAL password (not a placeholder)
-        # Real password: -pSOMETHING where SOMETHING is not 'password' and not whitespace
-        has_real_password = re.search(r'-p[^\s\'"]\S*', command) and not has_placeholder
+        if not self.credentials:
+            self.audit.log('WARNING', 'No credentials available for MySQL expansion')
+            return command
         
-        if has_real_password:
+        debug = self.audit.is_enabled('DEBUG')
+        if verdict == 'unparsable':
+            self.audit.log('WARNING', f'Cannot parse MySQL command ({detail}), leaving it unchanged')
+            return command
+        if verdict == 'real-password':
             self.audit.log('DEBUG', 'MySQL command already has real inline password')
             return command
-        
-        needs_expansion = has_placeholder or has_interactive or has_p_at_end or has_standalone_p
-        
-        if not needs_expansion:
+        if verdict == 'no-password':
             self.audit.log('DEBUG', 'MySQL command does not need password expansion')
             return command
         
-        self.audit.log('DEBUG', f'MySQL command needs credential expansion: {command[:50]}')
-        
-        # Determine which credentials to use based on hostname
-        cred_section = None
-        if 'hbcsrv12' in hostname:
-            if 'mysql_root' in self.credentials:
-                cred_section = 'mysql_root'
-                self.audit.log('DEBUG', f'Using credentials from [mysql_root] for {hostname}')
-        
-        if not cred_section:
-            self.audit.log('WARNING', f'No MySQL credentials found for hostname: {hostname}')
-            return command
-        
-        # Get credentials
-        user = self.credentials[cred_section].get('user', 'root')
-        password = self.credentials[cred_section].get('password', '')
+        cmd_type, rest, tail = detail
+        if debug:
+            self.audit.log('DEBUG', f'MySQL command needs credential expansion: {command[:50]}')
         
-        if not password:
-            self.audit.log('ERROR', f'Password is empty in [{cred_section}]')
+        creds = self._resolve_creds(hostname)
+        if not creds:
             return command
+        user, password = creds
         
-        self.audit.log('DEBUG', f'Found credentials - user: {user}, password length: {len(password)}')
-        
-        # Remove ALL password-related flags and placeholders
-        cleaned = command
-        # Remove -p'password', -p"password", -ppassword
-        cleaned = re.sub(r"-p['\"]?password['\"]?", '', cleaned, flags=re.IGNORECASE)
-        # Remove standalone -p (followed by space or end)
-        cleaned = re.sub(r'-p(?=\s|$)', '', cleaned)
-        # Remove any -pXXX that might remain
-        cleaned = re.sub(r'-p\S+', '', cleaned)
-        
-        # Remove existing -u flag (we'll add it back)
-        cleaned = re.sub(r'-u\s+\S+\s*', '', cleaned)
-        
-        # Clean up extra spaces
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-        
-        self.audit.log('DEBUG', f'Cleaned command: {cleaned}')
-        
-        # Build new command: mysql -u USER -pPASSWORD <rest>
-        # Insert credentials right after command name
-        expanded = re.sub(
-            f'^{cmd_type}\\s*',
-            f'{cmd_type} -u {user} -p{password} ',
-            cleaned
-        )
-        
-        # Clean up any double spaces
-        expanded = re.sub(r'\s+', ' ', expanded).strip()
+        # Build new command: mysql -u USER -pPASSWORD <rest>, quoted as needed.
+        # shlex.join single-quotes anything bash could interpret, so only the
+        # unquoted tail still needs its backticks escaped
+        expanded = shlex.join([cmd_type, '-u', user, f'-p{password}', *rest])
+        if tail:
+            expanded += ' ' + self._escape_for_bash(tail)
         
         self.audit.log('INFO', f'MySQL command expanded successfully')
-        self.audit.log('DEBUG', f'Original: {command[:80]}')
-        self.audit.log('DEBUG', f'Expanded: {cmd_type} -u {user} -p*** ...')
+        if debug:
+            self.audit.log('DEBUG', f'Original: {command[:80]}')
+            self.audit.log('DEBUG', f'Expanded: {cmd_type} -u {user} -p*** ...')
         
         return expanded
 
+    def _load_credentials(self):
+        """(Re)read the credentials file and forget all resolved host credentials"""
+        try:
+            self._credentials_mtime = os.stat(self._credentials_file).st_mtime_ns
+        except OSError:
+            self._credentials_mtime = None
+        self.credentials = configparser.ConfigParser()
+        self.credentials.read(self._credentials_file)
+        # Hostname substring -> credentials section, e.g. hbcsrv12 = mysql_root
+        if self.credentials.has_section('mysql_hosts'):
+            self._mysql_hosts = dict(self.credentials.items('mysql_hosts', raw=True))
+        else:
+            self._mysql_hosts = {'hbcsrv12': 'mysql_root'}
+        self._cred_cache.clear()
+
+    def _resolve_creds(self, hostname: str) -> Optional[Tuple[str, str]]:
+        """MySQL (user, password) for hostname, or None - resolved once per host
+        
+        The credentials file is checked for changes at most once a minute.
+        """
+        now = time.monotonic()
+        if now - self._credentials_checked > 60:
+            self._credentials_checked = now
+            try:
+                mtime = os.stat(self._credentials_file).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._credentials_mtime:
+                self._load_credentials()
+        
+        if hostname in self._cred_cache:
+            return self._cred_cache[hostname]
+        
+        creds = None
+        cred_section = next((section for pattern, section in self._mysql_hosts.items()
+                             if pattern in hostname and section in self.credentials), None)
+        if not cred_section:
+            self.audit.log('WARNING', f'No MySQL credentials found for hostname: {hostname}')
+        else:
+            user = self.credentials[cred_section].get('user', 'root')
+            password = self.credentials[cred_section].get('password', '')
+            if not password:
+                self.audit.log('ERROR', f'Password is empty in [{cred_section}]')
+            else:
+                creds = (user, password)
+                if self.audit.is_enabled('DEBUG'):
+                    self.audit.log('DEBUG', f'Using credentials from [{cred_section}] for {hostname} - '
+                                            f'user: {user}, password length: {len(password)}')
+        
+        self._cred_cache[hostname] = creds
+        return creds
+
     def _escape_for_bash(self, command: str) -> str:
         """Escape special characters that bash would interpret"""
         
@@ -148,17 +340,80 @@ class CommandExecutor:
         # In bash, \` is a literal backtick
         escaped = command.replace('`', '\\`')
         
-        if escaped != command:
+        if escaped != command and self.audit.is_enabled('DEBUG'):
             self.audit.log('DEBUG', f'Escaped backticks in command')
             self.audit.log('DEBUG', f'Original: {command[:100]}')
             self.audit.log('DEBUG', f'Escaped: {escaped[:100]}')
         
         return escaped
 
+    def _prepare_command(self, command: str, hostname: str) -> str:
+        """Expand MySQL credentials and escape the command for bash"""
+        expanded = self._expand_mysql_command(command, hostname)
+        if expanded is command:
+            return self._escape_for_bash(command)
+        # Already quoted by _expand_mysql_command - escaping again would put
+        # literal backslashes into single-quoted arguments
+        return expanded
+
+    def _cn_command(self, target_host: str, encoded_command: str) -> List[str]:
+        """SSH command line running a base64 encoded command via cn --b64"""
+        return [
+            'ssh',
+            '-o', 'LogLevel=ERROR',
+            *self.ssh_opts,
+            f'{self.jumpserver_user}@{self.jumpserver}',
+            self.cn_script,
+            '--b64',
+            target_host,
+            encoded_command
+        ]
+
+    def _encode_command(self, command: str, hostname: str) -> str:
+        """Expand, escape and base64 encode a command for cn --b64"""
+        # Expand MySQL commands with credentials if needed and escape
+        # special bash characters (backticks, etc.)
+        escaped_command = self._prepare_command(command, hostname)
+        
+        debug = self.audit.is_enabled('DEBUG')
+        
+        if debug and escaped_command != command:
+            self.audit.log('DEBUG', f'Original command: {command}')
+            self.audit.log('DEBUG', f'Expanded to: {escaped_command}')
+        
+        if debug:
+            self.audit.log('DEBUG', f'Executing on {_short(hostname)}: {escaped_command[:200]}')
+        
+        # Encode command as base64 to avoid ALL quoting issues
+        encoded_command = _b64(escaped_command)
+        
+        # DEBUG: Log what we're actually sending
+        if debug:
+            self.audit.log('DEBUG', f'Base64 encoded command: {encoded_command}')
+        
+        return encoded_command
+
+    def _record_exit(self, result: Dict, target_host: str, returncode: int, stdout: str, stderr: str):
+        """Fill a result dict from a finished cn run"""
+        result['exit_code'] = returncode
+        result['stdout'] = stdout.strip()
+        result['stderr'] = stderr.strip()
+        
+        # Command is successful if exit code is 0
+        result['success'] = (returncode == 0)
+        
+        if result['success']:
+            self.audit.log('INFO', f'Command successful on {target_host}')
+        else:
+            result['error_message'] = f"Exit code: {returncode}"
+            if result['stderr']:
+                result['error_message'] += f", stderr: {result['stderr'][:200]}"
+            self.audit.log('WARNING', f'Command failed on {target_host}: {result["error_message"]}')
+
     def execute_single_diagnostic(self, hostname: str, command: str) -> Dict:
         """Execute a single diagnostic command on target host via cn script"""
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = {
             'command': command,
             'hostname': hostname,
@@ -169,76 +424,212 @@ class CommandExecutor:
             'execution_time': 0,
             'error_message': None
         }
+        # Extract hostname without domain
+        target_host = _short(hostname)
         
         try:
-            # Extract hostname without domain
-            target_host = hostname.split('.')[0] if '.' in hostname else hostname
-            
-            # Expand MySQL commands with credentials if needed
-            expanded_command = self._expand_mysql_command(command, hostname)
-            
-            if expanded_command != command:
-                self.audit.log('DEBUG', f'Original command: {command}')
-                self.audit.log('DEBUG', f'Expanded to: {expanded_command}')
-            
-            # Escape special bash characters (backticks, etc.)
-            escaped_command = self._escape_for_bash(expanded_command)
-            
-            self.audit.log('DEBUG', f'Executing on {target_host}: {escaped_command[:200]}')
-            
-            # Encode command as base64 to avoid ALL quoting issues
-            encoded_command = base64.b64encode(escaped_command.encode('utf-8')).decode('ascii')
+            proc = subprocess.run(
+                self._cn_command(target_host, self._encode_command(command, hostname)),
+                capture_output=True,
+                text=True,
+                timeout=self.timeout
+            )
+            self._record_exit(result, target_host, proc.returncode, proc.stdout, proc.stderr)
             
-            # DEBUG: Log what we're actually sending
-            self.audit.log('DEBUG', f'Base64 encoded command: {encoded_command}')
-            self.audit.log('DEBUG', f'Decoded back (verification): {base64.b64decode(encoded_command).decode("utf-8")}')
+        except subprocess.TimeoutExpired:
+            result['error_message'] = f"Command timed out after {self.timeout} seconds"
+            self.audit.log('ERROR', f'Command timeout on {target_host}')
+        except Exception as e:
+            result['error_message'] = str(e)
+            self.audit.log('ERROR', f'Command failed: {e}')
+        finally:
+            result['execution_time'] = round(time.perf_counter() - start_time, 2)
+        
+        return result
+    
+    async def aexecute_single_diagnostic(self, hostname: str, command: str) -> Dict:
+        """Async execute_single_diagnostic - an event loop can overlap many hosts' SSH round trips"""
+        
+        start_time = time.perf_counter()
+        result = {
+            'command': command,
+            'hostname': hostname,
+            'success': False,
+            'stdout': '',
+            'stderr': '',
+            'exit_code': -1,
+            'execution_time': 0,
+            'error_message': None
+        }
+        target_host = _short(hostname)
+        
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self._cn_command(target_host, self._encode_command(command, hostname)),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+            self._record_exit(result, target_host, proc.returncode,
+                              stdout.decode('utf-8', errors='replace'),
+                              stderr.decode('utf-8', errors='replace'))
             
-            # Build SSH command using cn script with --b64 flag
-            ssh_cmd = [
-                'ssh',
-                '-o', 'LogLevel=ERROR',
-                f'{self.jumpserver_user}@{self.jumpserver}',
-                self.cn_script,
-                '--b64',
-                target_host,
-                encoded_command
-            ]
+        except asyncio.TimeoutError:
+            result['error_message'] = f"Command timed out after {self.timeout} seconds"
+            self.audit.log('ERROR', f'Command timeout on {target_host}')
+        except Exception as e:
+            result['error_message'] = str(e)
+            self.audit.log('ERROR', f'Command failed: {e}')
+        finally:
+            result['execution_time'] = round(time.perf_counter() - start_time, 2)
         
-            # Execute
+        return result
+    
+    def execute_batch(self, hostname: str, commands: List[str]) -> List[Dict]:
+        """Execute several commands on one target host in a single cn --b64 invocation
+        
+        The commands go out as one script with a ===CMD_<i>_RC=<exit code>===
+        line after each, so stdout can be split back into per-command results
+        while the SSH round trip and cn login are paid once. stderr is not
+        split; it is attached to the commands that failed.
+        """
+        if len(commands) <= 1:
+            return [self.execute_single_diagnostic(hostname, command) for command in commands]
+        
+        start_time = time.perf_counter()
+        results = [{
+            'command': command,
+            'hostname': hostname,
+            'success': False,
+            'stdout': '',
+            'stderr': '',
+            'exit_code': -1,
+            'execution_time': 0,
+            'error_message': None
+        } for command in commands]
+        target_host = _short(hostname)
+        timeout = self.timeout * len(commands)
+        
+        try:
+            script = '\n'.join(
+                f"{self._prepare_command(command, hostname)}\n"
+                f"printf '\\n===CMD_%d_RC=%d===\\n' {i} $?"
+                for i, command in enumerate(commands)
+            )
+            if self.audit.is_enabled('DEBUG'):
+                self.audit.log('DEBUG', f'Executing {len(commands)} commands on {target_host}: {commands[0][:100]}...')
+            
             proc = subprocess.run(
-                ssh_cmd,
+                self._cn_command(target_host, _b64(script)),
                 capture_output=True,
                 text=True,
-                timeout=self.timeout
+                timeout=timeout
             )
+            stderr = proc.stderr.strip()
             
-            result['exit_code'] = proc.returncode
-            result['stdout'] = proc.stdout.strip()
-            result['stderr'] = proc.stderr.strip()
+            # [output0, i, rc, output1, i, rc, ..., trailing output]
+            parts = _BATCH_MARKER_RE.split(proc.stdout)
+            for n in range(1, len(parts) - 1, 3):
+                index, rc = int(parts[n]), int(parts[n + 1])
+                if index >= len(results):
+                    continue
+                result = results[index]
+                result['stdout'] = parts[n - 1].strip()
+                result['exit_code'] = rc
+                result['success'] = (rc == 0)
+                if rc != 0:
+                    result['stderr'] = stderr
+                    result['error_message'] = f"Exit code: {rc}"
+                    if stderr:
+                        result['error_message'] += f", stderr: {stderr[:200]}"
             
-            # Command is successful if exit code is 0
-            result['success'] = (proc.returncode == 0)
+            for result in results:
+                if result['exit_code'] == -1:
+                    # Script ended early (exit, cn or ssh failure) before this marker
+                    result['stderr'] = stderr
+                    result['error_message'] = f"No exit status received (ssh exit code: {proc.returncode})"
             
-            if result['success']:
-                self.audit.log('INFO', f'Command successful on {target_host}')
+            failed = sum(not result['success'] for result in results)
+            if failed:
+                self.audit.log('WARNING', f'{failed} of {len(commands)} batched commands failed on {target_host}')
             else:
-                result['error_message'] = f"Exit code: {proc.returncode}"
-                if result['stderr']:
-                    result['error_message'] += f", stderr: {result['stderr'][:200]}"
-                self.audit.log('WARNING', f'Command failed on {target_host}: {result["error_message"]}')
+                self.audit.log('INFO', f'Batch of {len(commands)} commands successful on {target_host}')
             
         except subprocess.TimeoutExpired:
-            result['error_message'] = f"Command timed out after {self.timeout} seconds"
-            self.audit.log('ERROR', f'Command timeout on {target_host}')
+            for result in results:
+                result['error_message'] = f"Batch timed out after {timeout} seconds"
+            self.audit.log('ERROR', f'Batch timeout on {target_host}')
         except Exception as e:
-            result['error_message'] = str(e)
-            self.audit.log('ERROR', f'Command failed: {e}')
+            for result in results:
+                result['error_message'] = str(e)
+            self.audit.log('ERROR', f'Batch failed: {e}')
         finally:
-            result['execution_time'] = round(time.time() - start_time, 2)
+            elapsed = round(time.perf_counter() - start_time, 2)
+            for result in results:
+                result['execution_time'] = elapsed
         
-        return result
+        return results
+    
+    def execute_many(self, pairs: List[Tuple[str, str]],
+                     max_concurrency: Optional[int] = None) -> List[Dict]:
+        """Run (hostname, command) pairs concurrently; results keep the input order"""
+        if not pairs:
+            return []
+
+        def run(pair: Tuple[str, str]) -> Dict:
+            hostname, command = pair
+            try:
+                return self.execute_single_diagnostic(hostname, command)
+            except Exception as e:
+                # One broken task must not take the rest of the scan with it
+                return {
+                    'command': command,
+                    'hostname': hostname,
+                    'success': False,
+                    'stdout': '',
+                    'stderr': '',
+                    'exit_code': -1,
+                    'execution_time': 0,
+                    'error_message': str(e)
+                }
+
+        workers = max_concurrency or min(len(pairs), MAX_PARALLEL)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run, pairs))
     
     def test_connectivity(self, hostname: str) -> bool:
-        """Test if host is reachable via cn script"""
+        """Test if host is reachable via cn script (answers cached for a few seconds)"""
+        with self._reach_lock:
+            checked_at, reachable = self._reach_cache.get(hostname, (float('-inf'), None))
+        if time.monotonic() - checked_at < self._reach_ttl:
+            return reachable
+        
         result = self.execute_single_diagnostic(hostname, "echo 'connectivity_test'")
-        return result['success'] and 'connectivity_test' in result['stdout']
+        reachable = result['success'] and 'connectivity_test' in result['stdout']
+        with self._reach_lock:
+            self._reach_cache[hostname] = (time.monotonic(), reachable)
+        return reachable
+    
+    def test_connectivity_many(self, hostnames: List[str]) -> Dict[str, bool]:
+        """Reachability of several hosts; the ones not cached are probed concurrently"""
+        now = time.monotonic()
+        answers = {}
+        with self._reach_lock:
+            for hostname in hostnames:
+                checked_at, reachable = self._reach_cache.get(hostname, (float('-inf'), None))
+                if now - checked_at < self._reach_ttl:
+                    answers[hostname] = reachable
+        
+        unknown = [hostname for hostname in dict.fromkeys(hostnames) if hostname not in answers]
+        results = self.execute_many([(hostname, "echo 'connectivity_test'") for hostname in unknown])
+        with self._reach_lock:
+            for hostname, result in zip(unknown, results):
+                reachable = result['success'] and 'connectivity_test' in result['stdout']
+                self._reach_cache[hostname] = (time.monotonic(), reachable)
+                answers[hostname] = reachable
+        return answers
@@ -9,9 +9,20 @@ import json
 import time
 import re
 import difflib
-import os
-from typing import Dict, List, Optional
+import functools
+import atexit
+import threading
+from typing import Dict, List, Optional, Sequence
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from hbai_colors import Colors, SEP
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -19,18 +30,103 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 CONFIG_DIR = "/etc/hbai-mon"
 INFRASTRUCTURE_FILE = f"{CONFIG_DIR}/infrastructure.txt"
 
+# Sections of an AI answer (_parse_interactive_response)
+_DONE_RE = re.compile(r'DIAGNOSIS_COMPLETE:\s*true', re.IGNORECASE)
+_ROOT_CAUSE_RE = re.compile(r'ROOT_CAUSE:\s*(.+?)(?=LONG_TERM_SOLUTION:|$)', re.DOTALL | re.IGNORECASE)
+_SOLUTION_RE = re.compile(
+    r'LONG_TERM_SOLUTION:\s*(.+?)(?=IMMEDIATE_ACTIONS:|PREVENTIVE_MEASURES:|COMMANDS_TO_IMPLEMENT:|$)',
+    re.DOTALL | re.IGNORECASE)
+_IMMEDIATE_RE = re.compile(r'IMMEDIATE_ACTIONS:\s*(.+?)(?=PREVENTIVE_MEASURES:|COMMANDS_TO_IMPLEMENT:|$)',
+                           re.DOTALL | re.IGNORECASE)
+_PREVENTIVE_RE = re.compile(r'PREVENTIVE_MEASURES:\s*(.+?)(?=COMMANDS_TO_IMPLEMENT:|$)', re.DOTALL | re.IGNORECASE)
+_COMMANDS_SECTION_RE = re.compile(r'COMMANDS_TO_IMPLEMENT:(.*?)$', re.DOTALL | re.IGNORECASE)
+_NUMBERED_LINE_RE = re.compile(r'^\d+\.\s*(.+?)$', re.MULTILINE)
+_TARGET_HOST_RE = re.compile(r'TARGET[_\s]*HOST:\s*[*`#]*\s*(\S+)', re.IGNORECASE)
+_NEXT_COMMAND_RE = re.compile(r'NEXT[_\s]*COMMAND:\s*[*`]*\s*(.+?)(?:[*`]*\s*(?:\n|$))', re.IGNORECASE | re.DOTALL)
+_NEXT_COMMAND_NEXT_LINE_RE = re.compile(r'NEXT[_\s]*COMMAND:\s*\n\s*(.+?)(?:\n|$)', re.IGNORECASE)
+_EXPLANATION_RE = re.compile(
+    r'EXPLANATION:\s*[*-]*\s*(.+?)(?:\n\n|\n-|\n\*|TARGET_HOST:|NEXT_COMMAND:|$)',
+    re.DOTALL | re.IGNORECASE)
+_BULLET_PREFIX_RE = re.compile(r'^[*-]\s+')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+
+# Reasoning blocks some models emit before the answer
+_THINK_OPEN_RE = re.compile(r'<think>', re.IGNORECASE)
+_THINK_CLOSE_RE = re.compile(r'</think>', re.IGNORECASE)
+_THINK_BLOCK_RE = re.compile(r'<think>.*?</think>', re.DOTALL | re.IGNORECASE)
+_THINK_UNCLOSED_RE = re.compile(r'<think>.*$', re.DOTALL | re.IGNORECASE)
+_THINK_TAG_RE = re.compile(r'</?think[^>]*>', re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+# Constant parts of the per-turn user prompt (_build_conversation_messages)
+_HISTORY_HEADER = f"""
+{SEP}
+PREVIOUSLY EXECUTED COMMANDS (recent outputs are in the conversation above):
+{SEP}
+"""
+
+_TASK_BLOCK = """
+YOUR TASK:
+Analyze the information gathered so far and suggest the NEXT SINGLE diagnostic command.
+Focus on finding the ROOT CAUSE, not just symptoms.
+Think about what LONG-TERM SOLUTION would prevent this problem from recurring.
+
+Remember:
+- Suggest exactly ONE command
+- Use a DIFFERENT approach than previous commands
+- """
+
+_RESPOND_BLOCK = """
+
+RESPOND WITH:
+TARGET_HOST: hostname.internal.boehmecke.org
+NEXT_COMMAND: single complete executable command
+EXPLANATION: why this command helps find the root cause
+"""
+
+_CONCLUDE_BLOCK = """
+OR if you have identified the root cause:
+DIAGNOSIS_COMPLETE: true
+ROOT_CAUSE: what is causing the problem and why it happened
+LONG_TERM_SOLUTION: permanent fix with specific implementation steps
+IMMEDIATE_ACTIONS: urgent steps if disk is critically full (optional)
+PREVENTIVE_MEASURES: how to prevent recurrence (monitoring, alerts, automation)
+COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
+"""
+
+
+@functools.lru_cache(maxsize=64)
+def _render_problem_block(hostname: str, mount_point: str, usage_percent,
+                          used_gb, total_gb, free_gb) -> str:
+    """Render the CURRENT PROBLEM block - constant for the lifetime of an alert"""
+    return f"""CURRENT PROBLEM:
+- Alerting Host: {hostname}
+- Mount Point: {mount_point}
+- Usage: {usage_percent}% ({used_gb}GB used / {total_gb}GB total)
+- Free Space: {free_gb}GB"""
 
-class Colors:
-    """ANSI color codes for terminal output"""
-    HEADER = '\033[95m'
-    OKBLUE = '\033[94m'
-    OKCYAN = '\033[96m'
-    OKGREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+
+@functools.lru_cache(maxsize=256)
+def _normalize_command(command: str) -> str:
+    """Lowercase a command and collapse its whitespace for similarity checks"""
+    return ' '.join(command.lower().split())
+
+
+def _command_answer_complete(response: str, start: int, end: int) -> bool:
+    """Whether response[start:end] already holds everything the parser reads
+    from a next-command answer"""
+    if _DONE_RE.search(response, start, end):
+        return False
+    # TARGET_HOST may come after EXPLANATION - its line must be finished too
+    target = _TARGET_HOST_RE.search(response, start, end)
+    if not target or response.find('\n', target.end(), end) < 0:
+        return False
+    if not _NEXT_COMMAND_RE.search(response, start, end):
+        return False
+    # The explanation runs until a blank line or the next field; a match that
+    # only ended at the end of the text may still grow
+    explanation = _EXPLANATION_RE.search(response, start, end)
+    return explanation is not None and explanation.end() > explanation.end(1)
 
 
 class InteractiveAIAnalyzer:
@@ -52,6 +148,12 @@ class InteractiveAIAnalyzer:
         # Minimum commands required before AI can conclude
         self.min_commands_required = int(api_config.get('min_commands_required', 10))
         
+        # Only the last history_window commands (plus up to half a window, see
+        # _build_conversation_messages) are replayed with their output, and
+        # that output is capped at history_max_chars in total
+        self.history_window = int(api_config.get('history_window', 6))
+        self.history_max_chars = int(api_config.get('history_max_chars', 12000))
+        
         # Model parameters from config
         self.temperature = float(api_config.get('temperature', 0.7))
         self.num_ctx = int(api_config.get('num_ctx', 16384))
@@ -65,9 +167,37 @@ class InteractiveAIAnalyzer:
         # Ollama native chat endpoint
         self.chat_endpoint = f"{self.api_url}/api/chat"
 
+        # One keep-alive session for all requests - reuses the TLS connection.
+        # Retried with a short backoff: failed connects (nothing was sent) and
+        # 502/503/504 answers from the Open-WebUI proxy. Read errors and read
+        # timeouts are never retried (read=False re-raises them unchanged, so
+        # a timeout still surfaces as requests' Timeout): a chat POST is not
+        # re-sent while a slow completion may still be running and one stuck
+        # turn costs at most one timeout. Once retries run out the last
+        # response is returned for normal handling.
+        self.session = requests.Session()
+        self.session.verify = self.verify_ssl
+        self.session.headers["Content-Type"] = "application/json"
+        if self.api_key:
+            self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=2, connect=2, read=False, status=2, backoff_factor=0.3,
+                              status_forcelist=(502, 503, 504),
+                              allowed_methods=frozenset({'GET', 'POST'}),
+                              raise_on_status=False)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        atexit.register(self.close)
+
         # Load infrastructure info
         self.infrastructure = self._load_infrastructure()
 
+        # The system prompt only depends on config, so render it once
+        self.system_prompt = self._build_system_prompt()
+
         self.audit.log('INFO', f'Initialized Ollama API: {self.chat_endpoint}')
         self.audit.log('INFO', f'Model: {self.model}')
         self.audit.log('INFO', f'Minimum commands required: {self.min_commands_required}')
@@ -77,27 +207,49 @@ class InteractiveAIAnalyzer:
             self.audit.log('INFO', f'API key prefix: {self.api_key[:10]}...')
         self.audit.log('INFO', f'Infrastructure loaded: {len(self.infrastructure)} chars')
 
+    def close(self):
+        """Close the pooled Ollama connections"""
+        self.session.close()
+
+    def prewarm(self):
+        """Open the Ollama connection in the background, ahead of the first chat request"""
+        threading.Thread(target=self._prewarm, name='ollama-prewarm', daemon=True).start()
+
+    def _prewarm(self):
+        try:
+            self.session.get(f"{self.api_url}/api/tags", timeout=10).close()
+            self.audit.log('DEBUG', 'Ollama connection prewarmed')
+        except requests.exceptions.RequestException as e:
+            self.audit.log('WARNING', f'Ollama prewarm failed: {e}')
+
     def _load_infrastructure(self) -> str:
         """Load infrastructure description from file"""
-        if os.path.exists(INFRASTRUCTURE_FILE):
-            try:
-                with open(INFRASTRUCTURE_FILE, 'r') as f:
-                    return f.read()
-            except Exception as e:
-                self.audit.log('WARNING', f'Failed to load infrastructure file: {e}')
+        try:
+            with open(INFRASTRUCTURE_FILE, 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.audit.log('WARNING', f'Failed to load infrastructure file: {e}')
         return "Infrastructure file not available."
 
     def _is_command_similar(self, new_command: str, existing_commands: List[str], threshold: float = 0.7) -> bool:
         """Check if new command is too similar to any existing command"""
 
-        # Normalize commands (remove extra spaces, lowercase)
-        new_cmd_normalized = ' '.join(new_command.lower().split())
+        # Executed commands are normalized once and remembered across
+        # retries and turns; one matcher is reused with the new command fixed
+        matcher = difflib.SequenceMatcher(None, _normalize_command(new_command))
 
         for existing in existing_commands:
-            existing_normalized = ' '.join(existing.lower().split())
+            matcher.set_seq2(_normalize_command(existing))
+
+            # Both quick ratios are upper bounds of ratio() - skip the full
+            # comparison when they already rule out a match
+            if matcher.real_quick_ratio() <= threshold or matcher.quick_ratio() <= threshold:
+                continue
 
             # Calculate similarity ratio
-            similarity = difflib.SequenceMatcher(None, new_cmd_normalized, existing_normalized).ratio()
+            similarity = matcher.ratio()
 
             if similarity > threshold:
                 self.audit.log('WARNING', f'Command too similar',
@@ -107,7 +259,7 @@ class InteractiveAIAnalyzer:
         return False
 
     def get_next_diagnostic_command(self, problem_context: Dict,
-                                   conversation_history: List[Dict]) -> Dict:
+                                   conversation_history: Sequence[Dict]) -> Dict:
         """Get next command with similarity checking"""
 
         # Track already executed commands
@@ -188,16 +340,9 @@ class InteractiveAIAnalyzer:
             'error': f'AI could not suggest a unique command after {max_attempts} attempts. Try larger model or manual intervention.'
         }
 
-    def _build_conversation_messages(self, context: Dict, history: List[Dict]) -> List[Dict]:
-        """Build proper conversation messages for Ollama chat API"""
-
-        messages = []
-        
-        # Count executed commands
-        num_executed = len([h for h in history if h.get('executed')])
-
-        # System message with infrastructure context and strict rules
-        system_content = f"""You are an expert Linux systems administrator conducting interactive diagnosis on a home infrastructure.
+    def _build_system_prompt(self) -> str:
+        """Build the system prompt with infrastructure context and strict rules"""
+        return f"""You are an expert Linux systems administrator conducting interactive diagnosis on a home infrastructure.
 
 INFRASTRUCTURE OVERVIEW:
 {self.infrastructure}
@@ -269,107 +414,131 @@ IMMEDIATE_ACTIONS: if urgent, what to do right now
 PREVENTIVE_MEASURES: how to prevent this in the future
 COMMANDS_TO_IMPLEMENT: specific commands to implement the solution (numbered list)"""
 
+    def _build_conversation_messages(self, context: Dict, history: Sequence[Dict]) -> List[Dict]:
+        """Build proper conversation messages for Ollama chat API"""
+
+        messages = []
+        
+        # Count executed commands
+        num_executed = sum(1 for h in history if h.get('executed'))
+
+        # System message with infrastructure context and strict rules
         messages.append({
             "role": "system",
-            "content": system_content
+            "content": self.system_prompt
         })
 
         # Track executed commands with their targets and outputs
         executed_cmds = []
-
-        # Add conversation history as proper message pairs
-        for item in history:
-            if item.get('executed'):
-                target = item.get('target_host', context['hostname'])
-                cmd_summary = f"{target}: {item['command']}"
-                
-                # Include truncated output in the summary
-                output = item.get('stdout', '')
-                if len(output) > 1000:
-                    output = output[:1000] + "\n... (truncated)"
-                
+        executed = [h for h in history if h.get('executed')]
+        
+        # Older commands are kept as one-line summaries only, so the prompt
+        # stays roughly the same size however deep the diagnosis goes. The
+        # window start moves in steps of half a window rather than every turn,
+        # so the replayed prefix stays identical for a few turns and Ollama can
+        # reuse its cached prompt evaluation instead of prefilling it again.
+        step = max(1, self.history_window // 2)
+        window_start = max(0, len(executed) - self.history_window) // step * step
+        
+        # Re-runs often return the exact same output - ship it once and point
+        # later copies at the first one (str hashes are cached, so this is cheap)
+        seen_outputs: Dict[str, int] = {}
+        same_as: List[Optional[int]] = [None] * len(executed)
+        for idx in range(window_start, len(executed)):
+            item = executed[idx]
+            stdout = item.get('stdout')
+            if stdout and item.get('success'):
+                same_as[idx] = seen_outputs.get(stdout)
+                seen_outputs.setdefault(stdout, idx + 1)
+        
+        # Spend the output budget newest first - the oldest replayed command
+        # is the first to get truncated
+        budgets = [0] * len(executed)
+        remaining = self.history_max_chars
+        for idx in range(len(executed) - 1, window_start - 1, -1):
+            # Failed commands are sent as their stderr - their stdout costs nothing
+            if same_as[idx] is None and executed[idx].get('success'):
+                budgets[idx] = min(3000, len(executed[idx].get('stdout') or ''), remaining)
+                remaining -= budgets[idx]
+
+        for idx, item in enumerate(executed):
+            target = item.get('target_host', context['hostname'])
+            cmd_summary = f"{target}: {item['command']}"
+            stdout = item.get('stdout') or ''
+            stdout_len = len(stdout)
+            
+            if idx < window_start:
                 executed_cmds.append({
-                    'summary': cmd_summary,
-                    'output': output,
+                    'summary': f"{cmd_summary} (executed, {stdout_len} bytes output)",
                     'success': item.get('success', False)
                 })
+                continue
+            
+            first = same_as[idx]
+            
+            if first is not None:
+                cmd_summary += f" (same output as #{first})"
+            
+            executed_cmds.append({
+                'summary': cmd_summary,
+                'success': item.get('success', False)
+            })
 
-                # User executed command
-                messages.append({
-                    "role": "user",
-                    "content": f"I executed on {target}: {item['command']}"
-                })
+            # User executed command
+            messages.append({
+                "role": "user",
+                "content": f"I executed on {target}: {item['command']}"
+            })
 
-                # Assistant sees the result
-                if item.get('success'):
-                    result = f"Output:\n{item['stdout'][:3000]}"
-                    if len(item.get('stdout', '')) > 3000:
-                        result += "\n... (truncated)"
+            # Assistant sees the result
+            if item.get('success'):
+                # Slice only when over the limit - one copy into the message either way
+                limit = budgets[idx]
+                if first is not None:
+                    result = f"Output: same as command #{first} ({stdout_len} bytes)"
+                elif stdout_len > limit:
+                    result = "Output:\n" + stdout[:limit] + "\n... (truncated)"
                 else:
-                    result = f"Error: {item.get('stderr', 'Unknown error')}"
+                    result = "Output:\n" + stdout
+            else:
+                result = f"Error: {item.get('stderr', 'Unknown error')}"
 
-                messages.append({
-                    "role": "assistant",
-                    "content": result
-                })
+            messages.append({
+                "role": "assistant",
+                "content": result
+            })
 
         # Build current prompt
-        current_prompt = f"""
-{'='*80}
-PREVIOUSLY EXECUTED COMMANDS AND RESULTS:
-{'='*80}
-"""
+        problem_block = _render_problem_block(
+            context['hostname'], context['mount_point'], context['usage_percent'],
+            context['used_gb'], context['total_gb'], context['free_gb']
+        )
+        parts: List[str] = [_HISTORY_HEADER]
 
         if executed_cmds:
             for i, cmd_info in enumerate(executed_cmds, 1):
                 status = "OK" if cmd_info['success'] else "FAILED"
-                current_prompt += f"\n{i}. [{status}] {cmd_info['summary']}\n"
-                if cmd_info['output']:
-                    # Indent output for readability
-                    indented_output = '\n'.join(f"   {line}" for line in cmd_info['output'].split('\n')[:20])
-                    current_prompt += f"{indented_output}\n"
-                    if len(cmd_info['output'].split('\n')) > 20:
-                        current_prompt += "   ... (output truncated)\n"
+                # Outputs already went out as message pairs - list the commands only
+                parts.append(f"{i}. [{status}] {cmd_info['summary']}\n")
         else:
-            current_prompt += "No commands executed yet.\n"
-
-        current_prompt += f"""
-{'='*80}
-
-PROGRESS: {num_executed}/{self.min_commands_required} commands executed (minimum required: {self.min_commands_required})
-
-CURRENT PROBLEM:
-- Alerting Host: {context['hostname']}
-- Mount Point: {context['mount_point']}
-- Usage: {context['usage_percent']}% ({context['used_gb']}GB used / {context['total_gb']}GB total)
-- Free Space: {context['free_gb']}GB
-
-YOUR TASK:
-Analyze the information gathered so far and suggest the NEXT SINGLE diagnostic command.
-Focus on finding the ROOT CAUSE, not just symptoms.
-Think about what LONG-TERM SOLUTION would prevent this problem from recurring.
-
-Remember:
-- Suggest exactly ONE command
-- Use a DIFFERENT approach than previous commands
-- {"You need " + str(self.min_commands_required - num_executed) + " more commands before you can conclude" if num_executed < self.min_commands_required else "You may conclude if you have enough information, or continue investigating"}
+            parts.append("No commands executed yet.\n")
 
-RESPOND WITH:
-TARGET_HOST: hostname.internal.boehmecke.org
-NEXT_COMMAND: single complete executable command
-EXPLANATION: why this command helps find the root cause
-"""
+        if num_executed < self.min_commands_required:
+            remember = f"You need {self.min_commands_required - num_executed} more commands before you can conclude"
+        else:
+            remember = "You may conclude if you have enough information, or continue investigating"
+        parts.append(
+            f"\n{SEP}\n\n"
+            f"PROGRESS: {num_executed}/{self.min_commands_required} commands executed "
+            f"(minimum required: {self.min_commands_required})\n\n"
+            f"{problem_block}\n"
+        )
+        parts += (_TASK_BLOCK, remember, _RESPOND_BLOCK)
 
         if num_executed >= self.min_commands_required:
-            current_prompt += """
-OR if you have identified the root cause:
-DIAGNOSIS_COMPLETE: true
-ROOT_CAUSE: what is causing the problem and why it happened
-LONG_TERM_SOLUTION: permanent fix with specific implementation steps
-IMMEDIATE_ACTIONS: urgent steps if disk is critically full (optional)
-PREVENTIVE_MEASURES: how to prevent recurrence (monitoring, alerts, automation)
-COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
-"""
+            parts.append(_CONCLUDE_BLOCK)
+
+        current_prompt = ''.join(parts)
 
         messages.append({
             "role": "user",
@@ -395,19 +564,12 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
             }
         }
 
-        headers = {
-            "Content-Type": "application/json"
-        }
-
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-
         try:
             self.audit.log('INFO', f'Sending request to Ollama ({len(messages)} messages)')
             self.audit.log('DEBUG', f'Request URL: {self.chat_endpoint}')
             self.audit.log('DEBUG', f'Model: {self.model}, timeout: {self.timeout}s')
 
-            start_time = time.time()
+            start_time = time.perf_counter()
             
             # Status tracking
             in_think_block = False
@@ -418,32 +580,44 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
             status_update_interval = 5  # Update elapsed time every 5 seconds
             
             full_response = ""
+            answer_start = 0  # Offset of the text after </think>
+            line_start = 0  # Offset of the line still being generated
+            explanation_seen = False
             
             # Print initial status
             print(f"\n{Colors.OKCYAN}[...] Waiting for AI response...{Colors.ENDC}", end='', flush=True)
 
-            with requests.post(
+            # Serialize once to bytes ourselves - orjson is much faster than the
+            # stdlib encoder requests uses for json= on history-heavy payloads
+            if orjson:
+                body = orjson.dumps(payload)
+            else:
+                # Same compact UTF-8 body orjson produces, not \uXXXX escapes
+                body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+            loads = orjson.loads if orjson else json.loads
+
+            with self.session.post(
                 self.chat_endpoint,
-                json=payload,
-                headers=headers,
+                data=body,
                 timeout=self.timeout,
-                verify=self.verify_ssl,
                 stream=True
             ) as response:
                 
                 if response.status_code != 200:
                     self.audit.log('ERROR', f'Ollama returned status {response.status_code}',
-                                 {'response': response.text[:500]})
+                                 {'response': response.content[:500].decode('utf-8', 'replace')})
                     print(f"\n{Colors.FAIL}[X] API error: {response.status_code}{Colors.ENDC}")
                     return None
 
+                # Lines stay bytes - both json and orjson parse them directly,
+                # so requests never runs its charset detection on the body
                 for line in response.iter_lines():
                     if not line:
                         continue
                     
                     try:
-                        data = json.loads(line)
-                    except json.JSONDecodeError:
+                        data = loads(line)
+                    except ValueError:  # json and orjson decode errors
                         continue
                     
                     # Extract token content
@@ -456,7 +630,7 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
                         if '<think>' in content.lower() and not think_started:
                             think_started = True
                             in_think_block = True
-                            elapsed = time.time() - start_time
+                            elapsed = time.perf_counter() - start_time
                             print(f"\r{Colors.WARNING}[THINK] AI is reasoning... [{elapsed:.0f}s, ~{token_count} tokens]{Colors.ENDC}      ", end='', flush=True)
                             self.audit.log('DEBUG', f'AI started thinking at {elapsed:.1f}s')
                         
@@ -464,13 +638,14 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
                         elif '</think>' in content.lower() and in_think_block:
                             in_think_block = False
                             answer_started = True
-                            elapsed = time.time() - start_time
+                            answer_start = len(full_response) - len(content)
+                            elapsed = time.perf_counter() - start_time
                             print(f"\r{Colors.OKGREEN}[DONE] Thinking complete, generating answer... [{elapsed:.0f}s, ~{token_count} tokens]{Colors.ENDC}      ", end='', flush=True)
                             self.audit.log('DEBUG', f'AI finished thinking at {elapsed:.1f}s, ~{token_count} tokens used for thinking')
                         
                         # Periodic status update while thinking
                         elif in_think_block:
-                            current_time = time.time()
+                            current_time = time.perf_counter()
                             if current_time - last_status_update >= status_update_interval:
                                 elapsed = current_time - start_time
                                 print(f"\r{Colors.WARNING}[THINK] AI is reasoning... [{elapsed:.0f}s, ~{token_count} tokens]{Colors.ENDC}      ", end='', flush=True)
@@ -478,16 +653,37 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
                         
                         # Status update while answering
                         elif answer_started or not think_started:
-                            current_time = time.time()
+                            current_time = time.perf_counter()
                             if current_time - last_status_update >= status_update_interval:
                                 elapsed = current_time - start_time
                                 status_msg = "generating answer" if answer_started else "processing"
                                 print(f"\r{Colors.OKCYAN}[GEN] AI is {status_msg}... [{elapsed:.0f}s, ~{token_count} tokens]{Colors.ENDC}      ", end='', flush=True)
                                 last_status_update = current_time
+                        
+                        # Stop reading once a complete next-command answer is in -
+                        # the parser ignores anything after it, and closing the
+                        # stream ends the generation on the server. Only the lines
+                        # this chunk completed are scanned until the EXPLANATION
+                        # line shows up; from then on each new line re-checks
+                        # whether the explanation (and TARGET_HOST) has ended.
+                        if '\n' in content:
+                            last_nl = full_response.rfind('\n')
+                            completed = full_response[line_start:last_nl].lower()
+                            line_start = last_nl + 1
+                            if not in_think_block and not explanation_seen:
+                                explanation_seen = 'explanation:' in completed
+                            if explanation_seen and _command_answer_complete(full_response, answer_start, line_start):
+                                # Keep complete lines only - the check did not see the rest
+                                full_response = full_response[:line_start]
+                                elapsed = time.perf_counter() - start_time
+                                print(f"\r{Colors.OKGREEN}[OK] Answer received [{elapsed:.1f}s, ~{token_count} tokens]{Colors.ENDC}      ")
+                                self.audit.log('INFO', f'Answer complete in {elapsed:.1f}s, stream closed early',
+                                               {'total_chars': len(full_response)})
+                                break
                     
                     # Check if done
                     if data.get('done', False):
-                        elapsed = time.time() - start_time
+                        elapsed = time.perf_counter() - start_time
                         done_reason = data.get('done_reason', 'complete')
                         
                         # Get actual token counts from final response
@@ -510,14 +706,15 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
                         break
 
             # Final logging
-            self.audit.log('DEBUG', f'Response START: {full_response[:500]}')
-            if len(full_response) > 500:
-                self.audit.log('DEBUG', f'Response END: {full_response[-500:]}')
+            if self.audit.is_enabled('DEBUG'):
+                self.audit.log('DEBUG', f'Response START: {full_response[:500]}')
+                if len(full_response) > 500:
+                    self.audit.log('DEBUG', f'Response END: {full_response[-500:]}')
 
             return full_response
 
         except requests.exceptions.Timeout:
-            elapsed = time.time() - start_time
+            elapsed = time.perf_counter() - start_time
             print(f"\r{Colors.FAIL}[X] Request timed out after {elapsed:.0f}s{Colors.ENDC}      ")
             self.audit.log('ERROR', f'Ollama API timeout after {self.timeout}s')
             return None
@@ -533,40 +730,37 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
     def _parse_interactive_response(self, response: str) -> Dict:
         """Parse Ollama response with target host support - handles Markdown formatting and thinking tags"""
 
-        # Log raw response for debugging
-        self.audit.log('DEBUG', f'Raw response length: {len(response)}')
-        self.audit.log('DEBUG', f'Raw response first 300 chars: {response[:300]}')
-        
-        # Check for <think> tags before stripping
-        think_matches = list(re.finditer(r'<think>', response, re.IGNORECASE))
-        think_end_matches = list(re.finditer(r'</think>', response, re.IGNORECASE))
-        self.audit.log('DEBUG', f'Found {len(think_matches)} <think> tags, {len(think_end_matches)} </think> tags')
-        
-        if think_matches:
-            for i, match in enumerate(think_matches):
-                self.audit.log('DEBUG', f'<think> tag {i+1} at position {match.start()}')
-        if think_end_matches:
-            for i, match in enumerate(think_end_matches):
-                self.audit.log('DEBUG', f'</think> tag {i+1} at position {match.start()}')
+        debug = self.audit.is_enabled('DEBUG')
+
+        # Log raw response for debugging - one audit record, and the tag scan
+        # is only needed for it
+        if debug:
+            self.audit.log('DEBUG', 'AI raw response', {
+                'length': len(response),
+                'first_300': response[:300],
+                'think_open_at': [m.start() for m in _THINK_OPEN_RE.finditer(response)],
+                'think_close_at': [m.start() for m in _THINK_CLOSE_RE.finditer(response)],
+            })
 
         # Strip <think> blocks (some models output reasoning) - handle multiple and mid-line occurrences
         original_len = len(response)
         
         # First, remove complete <think>...</think> blocks
-        response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL | re.IGNORECASE)
+        response = _THINK_BLOCK_RE.sub('', response)
         
         # Also handle unclosed <think> tags (thinking that continues to end of response)
-        response = re.sub(r'<think>.*$', '', response, flags=re.DOTALL | re.IGNORECASE)
+        response = _THINK_UNCLOSED_RE.sub('', response)
         
         # Clean up any leftover artifacts from mid-line think tags
-        response = re.sub(r'</?think[^>]*>', '', response, flags=re.IGNORECASE)
+        response = _THINK_TAG_RE.sub('', response)
         
         # Clean up extra whitespace and blank lines
-        response = re.sub(r'\n\s*\n', '\n', response)
+        response = _BLANK_LINES_RE.sub('\n', response)
         response = response.strip()
         
-        self.audit.log('DEBUG', f'After think-stripping: {original_len} -> {len(response)} chars')
-        self.audit.log('DEBUG', f'Stripped response: {response[:300] if response else "(empty)"}')
+        if debug:
+            self.audit.log('DEBUG', f'After think-stripping: {original_len} -> {len(response)} chars')
+            self.audit.log('DEBUG', f'Stripped response: {response[:300] if response else "(empty)"}')
 
         # If response is empty after stripping, it was all thinking
         if not response:
@@ -578,45 +772,33 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
             }
 
         # Check if diagnosis is complete
-        if re.search(r'DIAGNOSIS_COMPLETE:\s*true', response, re.IGNORECASE):
-
-            root_cause_match = re.search(
-                r'ROOT_CAUSE:\s*(.+?)(?=LONG_TERM_SOLUTION:|$)',
-                response,
-                re.DOTALL | re.IGNORECASE
-            )
+        done_match = _DONE_RE.search(response)
+        if done_match:
+
+            # The sections follow the DIAGNOSIS_COMPLETE line in the requested
+            # format - scan from there, and only fall back to the whole answer
+            # when the model put ROOT_CAUSE first
+            start = done_match.end()
+            root_cause_match = _ROOT_CAUSE_RE.search(response, start)
+            if not root_cause_match:
+                start = 0
+                root_cause_match = _ROOT_CAUSE_RE.search(response)
             root_cause = root_cause_match.group(1).strip() if root_cause_match else ''
 
-            solution_match = re.search(
-                r'LONG_TERM_SOLUTION:\s*(.+?)(?=IMMEDIATE_ACTIONS:|PREVENTIVE_MEASURES:|COMMANDS_TO_IMPLEMENT:|$)',
-                response,
-                re.DOTALL | re.IGNORECASE
-            )
+            solution_match = _SOLUTION_RE.search(response, start)
             long_term_solution = solution_match.group(1).strip() if solution_match else ''
 
-            immediate_match = re.search(
-                r'IMMEDIATE_ACTIONS:\s*(.+?)(?=PREVENTIVE_MEASURES:|COMMANDS_TO_IMPLEMENT:|$)',
-                response,
-                re.DOTALL | re.IGNORECASE
-            )
+            immediate_match = _IMMEDIATE_RE.search(response, start)
             immediate_actions = immediate_match.group(1).strip() if immediate_match else ''
 
-            preventive_match = re.search(
-                r'PREVENTIVE_MEASURES:\s*(.+?)(?=COMMANDS_TO_IMPLEMENT:|$)',
-                response,
-                re.DOTALL | re.IGNORECASE
-            )
+            preventive_match = _PREVENTIVE_RE.search(response, start)
             preventive_measures = preventive_match.group(1).strip() if preventive_match else ''
 
-            commands_match = re.search(
-                r'COMMANDS_TO_IMPLEMENT:(.*?)$',
-                response,
-                re.DOTALL | re.IGNORECASE
-            )
+            commands_match = _COMMANDS_SECTION_RE.search(response, start)
             implementation_commands = []
             if commands_match:
                 commands_text = commands_match.group(1)
-                cmd_lines = re.findall(r'^\d+\.\s*(.+?)$', commands_text, re.MULTILINE)
+                cmd_lines = _NUMBERED_LINE_RE.findall(commands_text)
                 implementation_commands = [line.strip() for line in cmd_lines if line.strip()]
 
             return {
@@ -633,11 +815,7 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
             }
 
         # Extract target host - handle Markdown formatting (###, **, etc.)
-        target_match = re.search(
-            r'TARGET[_\s]*HOST:\s*[*`#]*\s*(\S+)',
-            response,
-            re.IGNORECASE
-        )
+        target_match = _TARGET_HOST_RE.search(response)
         target_host = target_match.group(1).strip() if target_match else None
 
         # Remove any trailing Markdown characters from hostname
@@ -645,26 +823,14 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
             target_host = target_host.rstrip('*`#_')
 
         # Extract next command - more flexible pattern to handle various formats
-        command_match = re.search(
-            r'NEXT[_\s]*COMMAND:\s*[*`]*\s*(.+?)(?:[*`]*\s*(?:\n|$))',
-            response,
-            re.IGNORECASE | re.DOTALL
-        )
+        command_match = _NEXT_COMMAND_RE.search(response)
         
         # If that didn't work, try multiline: NEXT_COMMAND:\n<command>
         if not command_match or not command_match.group(1).strip():
-            command_match = re.search(
-                r'NEXT[_\s]*COMMAND:\s*\n\s*(.+?)(?:\n|$)',
-                response,
-                re.IGNORECASE
-            )
+            command_match = _NEXT_COMMAND_NEXT_LINE_RE.search(response)
 
         # Extract explanation - handle bold markers
-        explanation_match = re.search(
-            r'EXPLANATION:\s*[*-]*\s*(.+?)(?:\n\n|\n-|\n\*|TARGET_HOST:|NEXT_COMMAND:|$)',
-            response,
-            re.DOTALL | re.IGNORECASE
-        )
+        explanation_match = _EXPLANATION_RE.search(response)
 
         if command_match:
             command = command_match.group(1).strip()
@@ -677,8 +843,8 @@ COMMANDS_TO_IMPLEMENT: numbered list of commands to implement the solution
                 explanation = ''
                 if explanation_match:
                     explanation = explanation_match.group(1).strip()
-                    explanation = re.sub(r'^[*-]\s+', '', explanation)
-                    explanation = re.sub(r'\*\*(.+?)\*\*', r'\1', explanation)
+                    explanation = _BULLET_PREFIX_RE.sub('', explanation)
+                    explanation = _BOLD_RE.sub(r'\1', explanation)
 
                 self.audit.log('DEBUG', f'Parsed successfully: target={target_host}, command={command[:50]}')
                 return {
@@ -40,4 +40,5 @@ cat > /etc/logrotate.d/hbai-mon << EOF
 EOF
 
 echo "HBAI-MON installed successfully!"
+echo "Optional: apply /etc/hbai-mon/observium-indexes.sql to the Observium DB to speed up the alert scan"
 echo "Run 'hbai-mon' to start monitoring"
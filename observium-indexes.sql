@@ -0,0 +1,20 @@
+-- ============================================================================
+-- HBAI-MON - Optional indexes for the Observium disk alert query
+-- ============================================================================
+-- DatabaseManager.get_disk_alerts() filters storage rows on a fixed set of
+-- equality columns, a range on storage_perc and sorts by storage_perc DESC.
+-- Without a matching index MySQL scans the whole storage table and sorts the
+-- result (filesort). These composite indexes let the range scan walk
+-- storage_perc in index order and resolve the device filters from the index.
+--
+-- Apply once against the Observium database (as a user with ALTER privilege):
+--   mysql -u root -p observium < /etc/hbai-mon/observium-indexes.sql
+--
+-- Re-running fails with "Duplicate key name" - that is harmless.
+-- ============================================================================
+
+ALTER TABLE storage
+    ADD INDEX hbai_alert_scan (storage_type, storage_ignore, storage_deleted, storage_perc);
+
+ALTER TABLE devices
+    ADD INDEX hbai_alert_devices (status, `ignore`, disabled, hostname);
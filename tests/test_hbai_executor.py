@@ -0,0 +1,56 @@
+"""
+Tests for command preparation in hbai_executor
+"""
+
+import os
+import shlex
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hbai_executor import CommandExecutor
+
+
+class _Audit:
+    def is_enabled(self, level):
+        return True
+
+    def log(self, level, message, details=None):
+        pass
+
+
+def _executor():
+    """CommandExecutor with fixed MySQL credentials and no SSH setup"""
+    executor = CommandExecutor.__new__(CommandExecutor)
+    executor.audit = _Audit()
+    executor.credentials = {'mysql_root': {'user': 'root', 'password': 's3cret'}}
+    executor._resolve_creds = lambda hostname: ('root', 's3cret')
+    return executor
+
+
+class PrepareCommandTest(unittest.TestCase):
+
+    def test_backtick_identifier_in_expanded_query(self):
+        query = 'SELECT table_schema AS `Database` FROM information_schema.tables'
+        command = f'mysql -u root -p -e "{query}"'
+
+        prepared = _executor()._prepare_command(command, 'hbcsrv12')
+
+        self.assertEqual(shlex.split(prepared),
+                         ['mysql', '-u', 'root', '-ps3cret', '-e', query])
+
+    def test_backticks_in_tail_stay_escaped(self):
+        command = 'mysql -u root -p -e "SHOW DATABASES" | grep `hostname`'
+
+        prepared = _executor()._prepare_command(command, 'hbcsrv12')
+
+        self.assertTrue(prepared.endswith('| grep \\`hostname\\`'))
+
+    def test_plain_command_backticks_escaped(self):
+        prepared = _executor()._prepare_command('echo `id`', 'hbcsrv12')
+
+        self.assertEqual(prepared, 'echo \\`id\\`')
+
+
+if __name__ == '__main__':
+    unittest.main()